@@ -0,0 +1,538 @@
+"""
+Insurance Calculator Benchmarks:
+Synthetic FHIR bundles and timing runs for the insurance calculator.
+
+Bundles are generated deterministically from a seed so timings are comparable
+between runs and machines.
+
+Usage:
+    python insurance_benchmark.py population --sizes 10000 100000
+    python insurance_benchmark.py suite [--save-baseline]
+
+Suite timings are reported relative to a fixed calibration loop timed in the
+same process, so a baseline saved on one machine stays meaningful on another.
+The suite exits with status 1 when a path is slower than the committed
+baseline by more than the tolerance, and with status 2 when there is no
+baseline to compare with. Re-save the baseline after intended performance
+changes and commit it with them.
+
+Dependencies:
+    - numpy (population benchmark)
+    - insurance_calculator_refactored
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from insurance_calculator_refactored import InsuranceCalculator, evaluate_batch
+from insurance_rules import RuleSet, load_rules
+
+# Fixed evaluation date so generated look-back windows stay stable
+AS_OF = datetime(2025, 1, 1)
+
+COMMON_CONDITIONS = ["E11.9", "I10", "J45.909", "K21.9", "M54.5", "E78.5", "Z82.49"]
+SERIOUS_CONDITIONS = ["C34.90", "I21.4", "N18.6", "F20", "F10.20", "F32.5", "O09.90"]
+MEDICATIONS = ["Metformin", "Lisinopril", "Atorvastatin", "Warfarin", "Insulin glargine"]
+PROCEDURES = ["99213", "99213", "99214", "27447", "33533", "Z51.11", "Z00.6"]
+VACCINES = ["140", "17", "33", "62"]
+REPORTS = ["47527-7", "24604-1", "47519-4", "74211-9"]
+OCCUPATIONS = ["teacher", "engineer", "nurse", "construction", "miner"]
+ZIPS = ["10001", "02139", "94105", "60601", "73301"]
+
+# Suite sizes: bundles per run and resource counts per bundle
+SUITE_SIZES: Dict[str, Dict[str, Optional[int]]] = {
+    "small": {"bundles": 500},
+    "medium": {
+        "bundles": 50,
+        "conditions": 20,
+        "observations": 120,
+        "encounters": 100,
+        "medications": 60,
+    },
+    "huge": {
+        "bundles": 5,
+        "conditions": 200,
+        "observations": 5000,
+        "encounters": 2000,
+        "medications": 1000,
+    },
+}
+DEFAULT_BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "insurance_benchmark_baseline.json"
+)
+# Allowed slowdown against the baseline before the suite fails
+DEFAULT_TOLERANCE = 0.25
+# Iterations of the calibration loop timed alongside every measured path
+CALIBRATION_ITERATIONS = 20_000
+
+
+def _date(rng: random.Random, max_days: int) -> str:
+    """Random ISO date within ``max_days`` before ``AS_OF``."""
+    return (AS_OF - timedelta(days=rng.randint(0, max_days))).strftime("%Y-%m-%d")
+
+
+def _coding(code: str) -> Dict:
+    return {"coding": [{"code": code}]}
+
+
+# Quantity observations cycled through by the generator: (LOINC code, value)
+MEASUREMENTS: List[Tuple[str, Callable[[random.Random], float]]] = [
+    ("8302-2", lambda rng: rng.randint(150, 195)),  # Height
+    ("29463-7", lambda rng: rng.randint(50, 130)),  # Weight
+    ("18262-6", lambda rng: rng.randint(80, 230)),  # LDL
+    ("4548-4", lambda rng: round(rng.uniform(5.0, 9.0), 1)),  # HbA1c
+    ("55284-4", lambda rng: rng.randint(100, 160)),  # Blood pressure panel
+    ("85354-9", lambda rng: rng.randint(100, 160)),  # Blood pressure screening
+]
+
+
+def synthetic_bundle(
+    seed: int,
+    conditions: Optional[int] = None,
+    observations: Optional[int] = None,
+    encounters: Optional[int] = None,
+    medications: Optional[int] = None,
+) -> Dict:
+    """
+    Build a deterministic synthetic FHIR Bundle for one patient.
+
+    Resource counts left as None are drawn from the seed. Encounters and
+    medications cite the patient's conditions as reasons, cycling through
+    them; observations cycle through ``MEASUREMENTS``, so large counts build
+    long time series per LOINC code.
+
+    Args:
+        seed (int): Random seed; the same seed always yields the same bundle.
+        conditions (Optional[int]): Number of Condition resources (at least 1).
+        observations (Optional[int]): Number of quantity Observations.
+            Defaults to one per measurement.
+        encounters (Optional[int]): Number of Encounters. Defaults to one
+            per condition.
+        medications (Optional[int]): Number of MedicationRequests. Defaults
+            to one per condition.
+
+    Returns:
+        Dict: A FHIR Bundle with a patient and their clinical resources.
+    """
+    rng = random.Random(seed)
+    patient_id = f"patient-{seed}"
+    entries: List[Dict] = [
+        {
+            "resourceType": "Patient",
+            "id": patient_id,
+            "birthDate": (
+                f"{rng.randint(1935, 2005)}-{rng.randint(1, 12):02d}"
+                f"-{rng.randint(1, 28):02d}"
+            ),
+            "gender": rng.choice(["male", "female"]),
+            "address": [{"postalCode": rng.choice(ZIPS)}],
+        }
+    ]
+    serious = rng.random() < 0.15
+    if conditions is None:
+        conditions = rng.randint(1, 6)
+    conditions = max(1, conditions)
+    if encounters is None:
+        encounters = conditions
+    if medications is None:
+        medications = conditions
+    if observations is None:
+        observations = len(MEASUREMENTS)
+    pool = COMMON_CONDITIONS + (SERIOUS_CONDITIONS if serious else [])
+    condition_codes: List[str] = []
+    for i in range(max(conditions, encounters, medications)):
+        if i < conditions:
+            code = rng.choice(pool)
+            condition_codes.append(code)
+            entries.append(
+                {
+                    "resourceType": "Condition",
+                    "id": f"{patient_id}-condition-{i}",
+                    "code": _coding(code),
+                    "clinicalStatus": _coding(
+                        rng.choice(["active", "active", "resolved"])
+                    ),
+                    "category": [_coding(rng.choice(["chronic", "acute"]))],
+                    "onsetDateTime": _date(rng, 1000),
+                }
+            )
+        code = condition_codes[i % conditions]
+        if i < encounters:
+            entries.append(
+                {
+                    "resourceType": "Encounter",
+                    "id": f"{patient_id}-encounter-{i}",
+                    "type": [_coding(rng.choice(["AMB", "AMB", "ER", "185347001"]))],
+                    "period": {"start": _date(rng, 700)},
+                    "reasonCode": [_coding(code)],
+                }
+            )
+        if i < medications:
+            entries.append(
+                {
+                    "resourceType": "MedicationRequest",
+                    "id": f"{patient_id}-medication-{i}",
+                    "status": rng.choice(["active", "active", "stopped"]),
+                    "authoredOn": _date(rng, 500),
+                    "reasonCode": [_coding(code)],
+                    "medicationCodeableConcept": {"text": rng.choice(MEDICATIONS)},
+                }
+            )
+    measurements = []
+    for i in range(observations):
+        code, generate = MEASUREMENTS[i % len(MEASUREMENTS)]
+        measurements.append((code, generate(rng)))
+    for i, (code, value) in enumerate(measurements):
+        entries.append(
+            {
+                "resourceType": "Observation",
+                "id": f"{patient_id}-observation-{i}",
+                "code": _coding(code),
+                "valueQuantity": {"value": value},
+                "effectiveDateTime": _date(rng, 400),
+            }
+        )
+    entries.append(
+        {
+            "resourceType": "Observation",
+            "id": f"{patient_id}-smoking",
+            "code": _coding("72166-2"),
+            "valueCodeableConcept": {
+                "text": rng.choice(["Never smoker", "Former", "Current smoker"])
+            },
+            "effectiveDateTime": _date(rng, 400),
+        }
+    )
+    entries.append(
+        {
+            "resourceType": "Observation",
+            "id": f"{patient_id}-alcohol",
+            "code": _coding("74013-4"),
+            "valueCodeableConcept": {"text": rng.choice(["no", "no", "yes"])},
+            "effectiveDateTime": _date(rng, 400),
+        }
+    )
+    entries.append(
+        {
+            "resourceType": "Observation",
+            "id": f"{patient_id}-occupation",
+            "code": _coding("67875-1"),
+            "valueString": rng.choice(OCCUPATIONS),
+            "effectiveDateTime": _date(rng, 400),
+        }
+    )
+    entries.append(
+        {
+            "resourceType": "Procedure",
+            "id": f"{patient_id}-procedure-0",
+            "code": _coding(rng.choice(PROCEDURES) if serious else "99213"),
+            "performedDateTime": _date(rng, 700),
+        }
+    )
+    for i, code in enumerate(rng.sample(VACCINES, rng.randint(0, 3))):
+        entries.append(
+            {
+                "resourceType": "Immunization",
+                "id": f"{patient_id}-immunization-{i}",
+                "vaccineCode": _coding(code),
+                "occurrenceDateTime": _date(rng, 500),
+            }
+        )
+    for i, code in enumerate(rng.sample(REPORTS, rng.randint(0, 3))):
+        entries.append(
+            {
+                "resourceType": "DiagnosticReport",
+                "id": f"{patient_id}-report-{i}",
+                "code": _coding(code),
+                "effectiveDateTime": _date(rng, 2000),
+            }
+        )
+    return {
+        "resourceType": "Bundle",
+        "type": "collection",
+        "entry": [{"resource": resource} for resource in entries],
+    }
+
+
+def synthetic_bundles(count: int, seed: int = 0, **sizes: Optional[int]) -> Iterator[Dict]:
+    """Yield ``count`` synthetic bundles starting from ``seed``."""
+    for i in range(count):
+        yield synthetic_bundle(seed + i, **sizes)
+
+
+def benchmark_population(size: int, max_workers: Optional[int] = 1) -> Dict[str, float]:
+    """
+    Compare looped ``calculate_premium()`` with vectorized population pricing.
+
+    Both paths are timed end to end from the parsed bundles: the vectorized
+    one includes fact extraction, not only the array pricing step.
+
+    Args:
+        size (int): Number of synthetic patients.
+        max_workers (Optional[int]): Worker processes for fact extraction.
+
+    Returns:
+        Dict[str, float]: Timings in seconds, the number of rows where only
+            one path found the patient eligible, and the largest premium
+            difference over rows both paths priced.
+    """
+    import numpy as np
+
+    from insurance_population import extract_features, price_population
+
+    rules = load_rules()
+    bundles = list(synthetic_bundles(size))
+
+    start = time.perf_counter()
+    looped = [
+        InsuranceCalculator(bundle, as_of=AS_OF, rules=rules).calculate_premium()
+        for bundle in bundles
+    ]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    features = extract_features(bundles, max_workers=max_workers, as_of=AS_OF, rules=rules)
+    extract_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = price_population(features, rules)
+    price_seconds = time.perf_counter() - start
+
+    expected = np.array([np.nan if p is None else p for p in looped])
+    # NaN marks an ineligible row; nanmax alone would hide a row priced by
+    # one path only, so the masks are compared separately
+    unpriced, vectorized_unpriced = np.isnan(expected), np.isnan(vectorized)
+    both = ~unpriced & ~vectorized_unpriced
+    return {
+        "patients": size,
+        "loop_seconds": loop_seconds,
+        "extract_seconds": extract_seconds,
+        "vectorized_price_seconds": price_seconds,
+        "vectorized_total_seconds": extract_seconds + price_seconds,
+        "eligibility_mismatches": int(np.sum(unpriced != vectorized_unpriced)),
+        "max_abs_difference": float(
+            np.max(np.abs(expected[both] - vectorized[both]), initial=0.0)
+        ),
+    }
+
+
+def _calibration_loop() -> None:
+    """
+    Fixed pure-Python workload timed as the suite's unit of measure.
+
+    It mixes the dict lookups, string formatting and sorting the calculator
+    spends its time on, so both scale alike across interpreters and CPUs.
+    """
+    records: Dict[str, List[str]] = {}
+    for i in range(CALIBRATION_ITERATIONS):
+        key = f"code-{i % 97}"
+        records.setdefault(key, []).append(f"{2000 + i % 25}-{i % 12 + 1:02d}")
+    for dates in records.values():
+        dates.sort()
+
+
+def _timed(run: Callable[[], object]) -> float:
+    """
+    Wall time of one ``run()`` call with the garbage collector paused, so
+    collection pauses stay out of the measurement.
+    """
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def _relative_per_bundle(
+    run: Callable[[List[Dict]], object], bundles: List[Dict], rounds: int
+) -> float:
+    """
+    Median over ``rounds`` runs of the time per bundle, in units of the
+    calibration loop.
+
+    Each run is divided by the mean of the calibration loops timed right
+    before and after it, so the pair sees the same CPU frequency and load;
+    the median of those ratios shrugs off the runs a noisy neighbour hits.
+    """
+    ratios = []
+    before = _timed(_calibration_loop)
+    for _ in range(rounds):
+        elapsed = _timed(lambda: run(bundles))
+        after = _timed(_calibration_loop)
+        ratios.append(elapsed / ((before + after) / 2))
+        before = after
+    return statistics.median(ratios) / len(bundles)
+
+
+def _fresh(bundles: List[Dict], rules: RuleSet) -> List[InsuranceCalculator]:
+    return [InsuranceCalculator(b, as_of=AS_OF, rules=rules) for b in bundles]
+
+
+def _timed_on_fresh(
+    method: Callable[[InsuranceCalculator], object],
+    bundles: List[Dict],
+    rules: RuleSet,
+    rounds: int,
+) -> float:
+    """Time ``method`` on freshly parsed calculators so no cache is reused."""
+    parsed = [_fresh(bundles, rules) for _ in range(rounds)]
+
+    def run(bundles: List[Dict]) -> None:
+        for calculator in parsed.pop():
+            method(calculator)
+
+    return _relative_per_bundle(run, bundles, rounds)
+
+
+def benchmark_suite(
+    sizes: Iterable[str] = tuple(SUITE_SIZES), rounds: int = 9
+) -> Dict[str, Dict[str, float]]:
+    """
+    Time the calculator's hot paths at each suite size.
+
+    Parsing is timed through the constructor; eligibility and premium on
+    freshly parsed calculators. Batch runs ``evaluate_batch`` in-process.
+
+    Args:
+        sizes (Iterable[str]): Names of ``SUITE_SIZES`` entries to run.
+        rounds (int): Runs per path; the median one is reported.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Time per bundle in calibration-loop
+            units, keyed by size and then by path ("parse_bundle",
+            "check_eligibility", "calculate_premium", "batch").
+    """
+    rules = load_rules()
+    results: Dict[str, Dict[str, float]] = {}
+    for size in sizes:
+        spec = dict(SUITE_SIZES[size])
+        count = spec.pop("bundles")
+        bundles = list(synthetic_bundles(count, **spec))
+        timings = {
+            "parse_bundle": _relative_per_bundle(
+                lambda bundles: _fresh(bundles, rules), bundles, rounds
+            ),
+            "check_eligibility": _timed_on_fresh(
+                InsuranceCalculator.check_eligibility, bundles, rules, rounds
+            ),
+            "calculate_premium": _timed_on_fresh(
+                InsuranceCalculator.calculate_premium, bundles, rules, rounds
+            ),
+        }
+        timings["batch"] = _relative_per_bundle(
+            lambda bundles: evaluate_batch(
+                bundles, max_workers=1, as_of=AS_OF, rules=rules
+            ),
+            bundles,
+            rounds,
+        )
+        results[size] = timings
+    return results
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> List[str]:
+    """
+    Compare suite timings with a stored baseline.
+
+    Args:
+        results (Dict[str, Dict[str, float]]): Output of ``benchmark_suite``.
+        baseline (Dict[str, Dict[str, float]]): Saved suite output, same
+            shape and units.
+        tolerance (float): Allowed slowdown as a fraction of the baseline.
+
+    Returns:
+        List[str]: One message per path slower than the baseline allows;
+            paths missing from the baseline are not compared.
+    """
+    regressions = []
+    for size, timings in results.items():
+        for path, seconds in timings.items():
+            expected = baseline.get(size, {}).get(path)
+            if expected is not None and seconds > expected * (1 + tolerance):
+                regressions.append(
+                    f"{size}/{path}: {seconds * 1e3:.2f} per bundle, "
+                    f"baseline {expected * 1e3:.2f} (+{tolerance:.0%} allowed)"
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    population = commands.add_parser(
+        "population", help="looped vs vectorized premium pricing"
+    )
+    population.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000]
+    )
+    population.add_argument("--workers", type=int, default=1)
+
+    suite = commands.add_parser(
+        "suite", help="time hot paths and compare with a stored baseline"
+    )
+    suite.add_argument(
+        "--sizes", nargs="+", choices=list(SUITE_SIZES), default=list(SUITE_SIZES)
+    )
+    suite.add_argument("--rounds", type=int, default=9)
+    suite.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    suite.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    suite.add_argument(
+        "--save-baseline", action="store_true", help="overwrite the baseline file"
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "suite":
+        results = benchmark_suite(args.sizes, rounds=args.rounds)
+        print("Per-bundle times in thousandths of a calibration loop")
+        for size, timings in results.items():
+            print(
+                f"{size:>6} | "
+                + " | ".join(
+                    f"{path} {units * 1e3:.2f}" for path, units in timings.items()
+                )
+            )
+        if args.save_baseline:
+            with open(args.baseline, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            print(f"Saved baseline to {args.baseline}")
+            return 0
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline")
+            return 2
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    if args.command == "population":
+        for size in args.sizes:
+            result = benchmark_population(size, max_workers=args.workers)
+            print(
+                f"{result['patients']:>8} patients | "
+                f"loop {result['loop_seconds']:.2f}s | "
+                f"vectorized {result['vectorized_total_seconds']:.2f}s "
+                f"(extract {result['extract_seconds']:.2f}s, "
+                f"price {result['vectorized_price_seconds'] * 1000:.1f}ms) | "
+                f"eligibility mismatches {result['eligibility_mismatches']} | "
+                f"max diff {result['max_abs_difference']:.2f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
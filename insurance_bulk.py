@@ -0,0 +1,213 @@
+"""
+Insurance Bulk Ingestion:
+Stream FHIR Bulk Data NDJSON exports into the insurance calculator.
+
+A Bulk Data export holds one resource type per ``.ndjson`` (or ``.ndjson.gz``)
+file, with each patient's resources scattered across files. Lines are read
+incrementally and spilled into hash partitions keyed by patient reference;
+each partition is then grouped in memory and yielded as one Bundle per
+patient. Peak memory is bounded by the largest partition, not the export.
+
+Dependencies:
+    - insurance_calculator_refactored
+    - insurance_records
+"""
+
+import glob
+import gzip
+import json
+import logging
+import os
+import tempfile
+import zlib
+from collections import defaultdict
+from typing import Dict, IO, Iterable, Iterator, List, Optional, Union
+
+from insurance_calculator_refactored import BatchResult, evaluate_batch
+from insurance_records import RECORD_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Target size of one spill partition; each is loaded into memory at once
+DEFAULT_PARTITION_BYTES = 64 * 1024 * 1024
+
+
+def export_files(export: Union[str, Iterable[str]]) -> List[str]:
+    """
+    Resolve an export directory or an explicit list of NDJSON files.
+
+    Args:
+        export (Union[str, Iterable[str]]): Export directory, or file paths.
+
+    Returns:
+        List[str]: Sorted NDJSON file paths.
+    """
+    if isinstance(export, str) and os.path.isdir(export):
+        return sorted(
+            glob.glob(os.path.join(export, "*.ndjson"))
+            + glob.glob(os.path.join(export, "*.ndjson.gz"))
+        )
+    if isinstance(export, str):
+        return [export]
+    return list(export)
+
+
+def _open_text(path: str, mode: str = "rt") -> IO[str]:
+    """Open a plain or gzip-compressed text file."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _data_bytes(path: str) -> int:
+    """
+    Uncompressed size of an NDJSON file, used to plan spill partitions.
+
+    For gzip files this is the ISIZE trailer: the uncompressed length modulo
+    2**32, lifted to the smallest matching value not below the compressed
+    size. Multi-member archives only report their last member, so those are
+    undercounted.
+    """
+    size = os.path.getsize(path)
+    if not path.endswith(".gz") or size < 18:
+        return size
+    with open(path, "rb") as f:
+        f.seek(-4, os.SEEK_END)
+        isize = int.from_bytes(f.read(4), "little")
+    wraps = max(0, -(-(size - isize) // 2**32))
+    return isize + wraps * 2**32
+
+
+def patient_reference(resource: Dict) -> Optional[str]:
+    """
+    Patient id a resource belongs to.
+
+    Args:
+        resource (Dict): A FHIR resource.
+
+    Returns:
+        Optional[str]: The Patient id, or None if the resource has no
+            patient reference.
+    """
+    if resource.get("resourceType") == "Patient":
+        return resource.get("id")
+    subject = resource.get("subject") or resource.get("patient") or {}
+    reference = subject.get("reference")
+    if not reference:
+        return None
+    return reference.rsplit("/", 1)[-1].rsplit(":", 1)[-1]
+
+
+def read_ndjson(path: str) -> Iterator[Dict]:
+    """Yield the resources of one NDJSON file, one line at a time."""
+    with _open_text(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _bundle(resources: List[Dict]) -> Dict:
+    return {
+        "resourceType": "Bundle",
+        "type": "collection",
+        "entry": [{"resource": resource} for resource in resources],
+    }
+
+
+def _group_by_patient(resources: Iterable[Dict]) -> Iterator[Dict]:
+    """Group resources of one partition into a Bundle per patient."""
+    grouped: Dict[str, List[Dict]] = defaultdict(list)
+    for resource in resources:
+        grouped[patient_reference(resource)].append(resource)
+    for resources_for_patient in grouped.values():
+        yield _bundle(resources_for_patient)
+
+
+def stream_patient_bundles(
+    export: Union[str, Iterable[str]],
+    partition_bytes: int = DEFAULT_PARTITION_BYTES,
+    workdir: Optional[str] = None,
+) -> Iterator[Dict]:
+    """
+    Stream a Bulk Data export as one FHIR Bundle per patient.
+
+    Resource types the calculator does not read, and resources without a
+    patient reference, are skipped.
+
+    Args:
+        export (Union[str, Iterable[str]]): Export directory or NDJSON files.
+        partition_bytes (int): Target spill partition size in uncompressed
+            bytes; bounds peak memory.
+        workdir (Optional[str]): Directory for spill files. Defaults to the
+            system temporary directory.
+
+    Yields:
+        Dict: A Bundle with every supported resource of one patient.
+    """
+    paths = export_files(export)
+    total_bytes = sum(_data_bytes(path) for path in paths)
+    partitions = max(1, -(-total_bytes // partition_bytes))
+    skipped = 0
+
+    def supported(path: str) -> Iterator[Dict]:
+        nonlocal skipped
+        for resource in read_ndjson(path):
+            if resource.get("resourceType") in RECORD_TYPES and patient_reference(
+                resource
+            ):
+                yield resource
+            else:
+                skipped += 1
+
+    if partitions == 1:
+        yield from _group_by_patient(
+            resource for path in paths for resource in supported(path)
+        )
+    else:
+        with tempfile.TemporaryDirectory(dir=workdir) as spill_dir:
+            spill_paths = [
+                os.path.join(spill_dir, f"partition-{i}.ndjson")
+                for i in range(partitions)
+            ]
+            spill_files = [_open_text(p, "wt") for p in spill_paths]
+            try:
+                for path in paths:
+                    for resource in supported(path):
+                        key = patient_reference(resource).encode("utf-8")
+                        spill = spill_files[zlib.crc32(key) % partitions]
+                        spill.write(json.dumps(resource, separators=(",", ":")))
+                        spill.write("\n")
+            finally:
+                for spill in spill_files:
+                    spill.close()
+            for spill_path in spill_paths:
+                yield from _group_by_patient(read_ndjson(spill_path))
+                os.remove(spill_path)
+
+    if skipped:
+        logger.info(f"Skipped {skipped} resources without a supported patient")
+
+
+def evaluate_bulk_export(
+    export: Union[str, Iterable[str]],
+    partition_bytes: int = DEFAULT_PARTITION_BYTES,
+    workdir: Optional[str] = None,
+    **batch_options,
+) -> BatchResult:
+    """
+    Evaluate every patient of a Bulk Data export in bounded memory.
+
+    Args:
+        export (Union[str, Iterable[str]]): Export directory or NDJSON files.
+        partition_bytes (int): Target spill partition size in bytes.
+        workdir (Optional[str]): Directory for spill files.
+        **batch_options: Passed to ``evaluate_batch`` (``max_workers``,
+            ``chunksize``, ``as_of``, ``rules``).
+
+    Returns:
+        BatchResult: Columnar eligibility, reasons and premium per patient.
+    """
+    bundles = stream_patient_bundles(
+        export, partition_bytes=partition_bytes, workdir=workdir
+    )
+    return evaluate_batch(bundles, **batch_options)
@@ -0,0 +1,199 @@
+"""
+Insurance Quote Cache:
+Content-addressed cache of eligibility and premium results.
+
+A quote depends only on the bundle contents, the rule set and the evaluation
+date, so results are keyed by a SHA-256 of the canonical bundle JSON plus the
+rule-set content digest and the as-of date. Editing a rule invalidates every
+cached quote, even if the rule file's version is not bumped. Repeat submissions of an identical
+bundle skip parsing and rule evaluation entirely.
+
+Results are kept in an in-memory LRU and, optionally, in an SQLite file that
+survives restarts and can be shared between processes.
+
+Dependencies:
+    - sqlite3 (optional on-disk tier)
+    - insurance_calculator_refactored
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from insurance_calculator_refactored import _evaluate_bundle
+from insurance_rules import RuleSet, load_rules
+
+# (patient id, eligible, reasons, premium), as returned by ``_evaluate_bundle``
+Quote = Tuple[Optional[str], bool, List[str], Optional[float]]
+
+
+def bundle_key(bundle: Dict, rules: RuleSet, as_of: datetime) -> str:
+    """
+    Content address of a quote.
+
+    Key order and whitespace do not matter; any change to a value does.
+    Only the date of ``as_of`` is used, since ages and look-back windows
+    are measured in whole days.
+
+    Args:
+        bundle (Dict): FHIR Bundle resource.
+        rules (RuleSet): Rule set the quote is evaluated with.
+        as_of (datetime): Evaluation timestamp.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{rules.digest}|{as_of.date().isoformat()}|".encode("utf-8"))
+    digest.update(
+        json.dumps(
+            bundle, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        ).encode("utf-8")
+    )
+    return digest.hexdigest()
+
+
+def _frozen(quote: Quote) -> Tuple:
+    patient_id, eligible, reasons, premium = quote
+    return patient_id, eligible, tuple(reasons), premium
+
+
+def _thawed(quote: Tuple) -> Quote:
+    patient_id, eligible, reasons, premium = quote
+    return patient_id, eligible, list(reasons), premium
+
+
+class QuoteCache:
+    """
+    LRU quote cache with an optional SQLite tier.
+
+    Reasons are stored as tuples and every lookup returns a fresh list, so a
+    caller mutating its quote cannot change what later hits see.
+
+    Attributes:
+        maxsize (int): Maximum number of quotes kept in memory.
+        hits (int): Lookups answered from memory or disk.
+        misses (int): Lookups that required an evaluation.
+    """
+
+    def __init__(self, maxsize: int = 10_000, path: Optional[str] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize (int): Maximum number of quotes kept in memory.
+            path (Optional[str]): SQLite file for the on-disk tier. Quotes are
+                only cached in memory when omitted.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS quotes (key TEXT PRIMARY KEY, quote TEXT)"
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def get(self, key: str) -> Optional[Quote]:
+        """
+        Look up a quote by key, promoting disk hits into memory.
+
+        Args:
+            key (str): Key from ``bundle_key``.
+
+        Returns:
+            Optional[Quote]: The cached quote, or None.
+        """
+        with self._lock:
+            quote = self._memory.get(key)
+            if quote is not None:
+                self._memory.move_to_end(key)
+                return _thawed(quote)
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT quote FROM quotes WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            quote = _frozen(json.loads(row[0]))
+            self._remember(key, quote)
+            return _thawed(quote)
+
+    def put(self, key: str, quote: Quote) -> None:
+        """
+        Store a quote in memory and, if configured, on disk.
+
+        Args:
+            key (str): Key from ``bundle_key``.
+            quote (Quote): Result of ``_evaluate_bundle``.
+        """
+        with self._lock:
+            self._remember(key, _frozen(quote))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO quotes (key, quote) VALUES (?, ?)",
+                    (key, json.dumps(quote)),
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, quote: Tuple) -> None:
+        self._memory[key] = quote
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def quote(
+        self,
+        bundle: Dict,
+        as_of: Optional[datetime] = None,
+        rules: Optional[RuleSet] = None,
+    ) -> Quote:
+        """
+        Evaluate a bundle, or return the cached result for identical input.
+
+        Args:
+            bundle (Dict): FHIR Bundle resource.
+            as_of (Optional[datetime]): Evaluation timestamp. Defaults to now.
+            rules (Optional[RuleSet]): Compiled rule set.
+
+        Returns:
+            Quote: Patient id, eligibility, reasons and premium.
+        """
+        rules = rules or load_rules()
+        as_of = as_of or datetime.now()
+        key = bundle_key(bundle, rules, as_of)
+        quote = self.get(key)
+        if quote is not None:
+            self.hits += 1
+            return quote
+        self.misses += 1
+        quote = _evaluate_bundle(bundle, as_of=as_of, rules=rules)
+        self.put(key, quote)
+        return quote
+
+    def clear(self) -> None:
+        """Drop every cached quote from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM quotes")
+                self._db.commit()
+
+    def close(self) -> None:
+        """Close the on-disk tier, if any."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
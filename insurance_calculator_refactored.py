@@ -7,23 +7,127 @@ medical data and calculate insurance eligibility and premiums. It processes vari
 resources including patient information, conditions, observations, procedures, and medications
 to make insurance-related decisions.
 
+Resources are read into lightweight records (see ``insurance_records``); the
+full FHIR models are only built when a caller asks for ``record.model``.
+
+``calculate_premium(trace=True)`` explains a quote as a ``PremiumTrace``: every
+applied multiplier, the fact that triggered it and the resources behind that
+fact, assembled from the facts already computed for the quote.
+
 Dependencies:
-    - fhirclient (for FHIR resource models)
+    - fhir.resources (for FHIR resource models, built lazily)
+    - insurance_metrics (optional per-rule instrumentation)
     - datetime
     - typing
 """
 
-from datetime import datetime
-from typing import Dict, List, Tuple, Optional
+import gc
+import os
+import time
+from bisect import bisect_right
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import partial, wraps
+from itertools import islice
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timedelta
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from insurance_records import (
+    ConditionRecord,
+    DiagnosticReportRecord,
+    EncounterRecord,
+    FhirRecord,
+    ImmunizationRecord,
+    MedicationRecord,
+    ObservationRecord,
+    PatientRecord,
+    ProcedureRecord,
+)
+from insurance_metrics import RuleMetrics
+from insurance_rules import CareRule, PrefixTable, PremiumFactor, RuleSet, load_rules
+
+# Record class and calculator list for each supported resource type
+_RESOURCE_LISTS = {
+    "Condition": (ConditionRecord, "conditions"),  # Medical diagnoses
+    "Observation": (ObservationRecord, "observations"),  # Clinical measurements
+    "Procedure": (ProcedureRecord, "procedures"),  # Medical procedures
+    "MedicationRequest": (MedicationRecord, "medications"),  # Prescriptions
+    "Encounter": (EncounterRecord, "encounters"),  # Healthcare visits
+    "Immunization": (ImmunizationRecord, "immunizations"),  # Vaccinations
+    "DiagnosticReport": (DiagnosticReportRecord, "diagnostic_reports"),  # Lab reports
+}
+
+# Position indexes per resource list: index attribute -> keys of a record
+_INDEXES: Dict[str, Dict[str, Callable]] = {
+    "conditions": {
+        "_condition_codes": lambda c: (c.code,),
+        "_condition_prefixes": lambda c: (c.code[:3],) if c.code else (),
+        "_condition_statuses": lambda c: (c.clinical_status,),
+        "_condition_categories": lambda c: set(c.categories),
+    },
+    "procedures": {"_procedure_codes": lambda p: (p.code,)},
+    "observations": {"_observation_codes": lambda o: (o.code,)},
+    "medications": {},
+    "encounters": {},
+    "immunizations": {},
+    "diagnostic_reports": {"_report_codes": lambda r: (r.code,)},
+}
+
+# Inputs read by chronic-condition management checks
+_MANAGEMENT_INPUTS = frozenset(
+    {"conditions", "encounters", "medications", "observations"}
+)
+_PREVENTIVE_INPUTS = frozenset(
+    {"patient", "immunizations", "observations", "diagnostic_reports", "encounters"}
+)
+
+# Inputs read by each memoized helper, keyed by method name
+_DERIVED_INPUTS: Dict[str, FrozenSet[str]] = {}
+
+
+def _derived(*inputs: str) -> Callable:
+    """
+    Memoize a calculator helper per instance and per argument tuple.
+
+    The cached value is dropped by ``add_resources`` when one of ``inputs``
+    changes. Returned values are shared between callers and must not be
+    mutated.
+
+    Args:
+        *inputs (str): Resource lists (or "patient") the helper reads.
+
+    Returns:
+        Callable: Decorator for the helper method.
+    """
+
+    def decorate(method: Callable) -> Callable:
+        name = method.__name__
+        _DERIVED_INPUTS[name] = frozenset(inputs)
+
+        @wraps(method)
+        def cached(self, *args):
+            key = (name,) + args
+            try:
+                return self._derived[key]
+            except KeyError:
+                value = self._derived[key] = method(self, *args)
+                return value
 
-from fhir.resources.patient import Patient
-from fhir.resources.condition import Condition
-from fhir.resources.observation import Observation
-from fhir.resources.procedure import Procedure
-from fhir.resources.medicationrequest import MedicationRequest
-from fhir.resources.encounter import Encounter
-from fhir.resources.immunization import Immunization
-from fhir.resources.diagnosticreport import DiagnosticReport
+        return cached
+
+    return decorate
 
 
 class InsuranceCalculator:
@@ -35,39 +139,66 @@ class InsuranceCalculator:
     such as age, medical conditions, procedures, medications, and lifestyle factors.
 
     Attributes:
-        patient (Patient): FHIR Patient resource.
-        conditions (List[Condition]): List of patient's medical conditions.
-        observations (List[Observation]): List of clinical observations.
-        procedures (List[Procedure]): List of medical procedures.
-        medications (List[MedicationRequest]): List of medication prescriptions.
+        patient (PatientRecord): FHIR Patient resource.
+        conditions (List[ConditionRecord]): List of patient's medical conditions.
+        observations (List[ObservationRecord]): List of clinical observations.
+        procedures (List[ProcedureRecord]): List of medical procedures.
+        medications (List[MedicationRecord]): List of medication prescriptions.
         base_premium (float): Base monthly premium amount.
-        risk_multiplier (float): Risk factor multiplier for premium calculation.
+        risk_multiplier (float): Risk multiplier of the latest premium quote.
         disqualifying_conditions (List[str]): List of conditions that make patient ineligible.
         risk_factors (List[str]): List of identified risk factors.
 
     Note:
         All FHIR resources are expected to follow the FHIR R4 specification.
+        Resources are held as lightweight records; ``record.model`` builds
+        the validated ``fhir.resources`` model on demand.
     """
 
-    def __init__(self, fhir_bundle: Dict):
+    def __init__(
+        self,
+        fhir_bundle: Dict,
+        as_of: Optional[datetime] = None,
+        rules: Optional[RuleSet] = None,
+        metrics: Optional[RuleMetrics] = None,
+    ):
         """
         Initialize the calculator with FHIR data.
 
         Args:
             fhir_bundle (Dict): FHIR Bundle resource containing patient data in R4 format.
+            as_of (Optional[datetime]): Evaluation timestamp that ages and
+                look-back windows are measured against. Defaults to now.
+            rules (Optional[RuleSet]): Compiled eligibility and premium rules.
+                Defaults to the bundled rule set.
+            metrics (Optional[RuleMetrics]): Collector for per-rule timing and
+                hit counts. Rules are not timed when omitted.
         """
+        # Batch workers fall back to the rule set installed by worker_pool
+        self.rules = rules or _worker_rules or load_rules()
+        self.as_of = as_of or datetime.now()
+        self.metrics = metrics
+        self._parsed_dates: Dict[str, datetime] = {}
+        # Cached eligibility check results and premium facts, by name
+        self._check_results: Dict[str, List[str]] = {}
+        self._fact_values: Dict[str, object] = {}
+        # Records each cached fact was derived from, for premium traces
+        self._fact_sources: Dict[str, List[FhirRecord]] = {}
+        self._derived: Dict[Tuple, object] = {}
+        self._applied_factors: Optional[List[PremiumFactor]] = None
+        self._multiplier: Optional[float] = None
         self.patient = None
-        self.conditions: List[Condition] = []
-        self.observations: List[Observation] = []
-        self.procedures: List[Procedure] = []
-        self.medications: List[MedicationRequest] = []
-        self.encounters: List[Encounter] = []
-        self.immunizations: List[Immunization] = []
-        self.diagnostic_reports: List[DiagnosticReport] = []
+        self.conditions: List[ConditionRecord] = []
+        self.observations: List[ObservationRecord] = []
+        self.procedures: List[ProcedureRecord] = []
+        self.medications: List[MedicationRecord] = []
+        self.encounters: List[EncounterRecord] = []
+        self.immunizations: List[ImmunizationRecord] = []
+        self.diagnostic_reports: List[DiagnosticReportRecord] = []
         self._parse_bundle(fhir_bundle)
 
         # Insurance parameters
-        self.base_premium = 500  # Base monthly premium in USD
+        self.base_premium = self.rules.base_premium  # Base monthly premium in USD
         self.risk_multiplier = 1.0  # Initial risk multiplier
         self.disqualifying_conditions: List[str] = []
         self.risk_factors: List[str] = []
@@ -76,39 +207,118 @@ class InsuranceCalculator:
         """
         Parse FHIR Bundle and extract relevant resources into instance variables.
 
+        Only the fields the rules read are extracted; no FHIR validation runs.
+
         Args:
             bundle (Dict): FHIR Bundle resource containing patient data entries.
         """
         for entry in bundle.get("entry", []):
-            resource = entry.get("resource", {})
-            resource_type = resource.get("resourceType", None)
-
-            # Map resources to appropriate FHIR classes
-            if resource_type == "Patient":
-                self.patient = Patient(**resource)
-            elif resource_type == "Condition":
-                self.conditions.append(
-                    Condition(**resource))  # Medical diagnoses
-            elif resource_type == "Observation":
-                self.observations.append(
-                    Observation(**resource)
-                )  # Clinical measurements
-            elif resource_type == "Procedure":
-                # Medical procedures
-                self.procedures.append(Procedure(**resource))
-            elif resource_type == "MedicationRequest":
-                self.medications.append(
-                    MedicationRequest(**resource))  # Prescriptions
-            elif resource_type == "Encounter":
-                self.encounters.append(
-                    Encounter(**resource))  # Healthcare visits
-            elif resource_type == "Immunization":
-                self.immunizations.append(
-                    Immunization(**resource))  # Vaccinations
-            elif resource_type == "DiagnosticReport":
-                self.diagnostic_reports.append(
-                    DiagnosticReport(**resource)
-                )  # Lab reports
+            self._add_resource(entry.get("resource", {}))
+        self._build_indexes()
+
+    def _add_resource(self, resource: Dict) -> Optional[str]:
+        """
+        Wrap one FHIR resource in its record and store it.
+
+        Args:
+            resource (Dict): A FHIR resource.
+
+        Returns:
+            Optional[str]: The input the resource was stored under ("patient"
+                or a resource list name), or None for unsupported types.
+        """
+        resource_type = resource.get("resourceType", None)
+        if resource_type == "Patient":
+            self.patient = PatientRecord(resource)
+            return "patient"
+        if resource_type not in _RESOURCE_LISTS:
+            return None
+        record_class, list_name = _RESOURCE_LISTS[resource_type]
+        getattr(self, list_name).append(record_class(resource))
+        return list_name
+
+    def _build_indexes(self) -> None:
+        """
+        Index parsed resources by code so rules answer in O(matches).
+
+        Indexes hold positions into the resource lists, which lets lookups
+        over several keys return resources in their original bundle order.
+        """
+        for list_name, indexes in _INDEXES.items():
+            for index_name in indexes:
+                setattr(self, index_name, defaultdict(list))
+            self._index_resources(list_name, 0)
+
+    def _index_resources(self, list_name: str, start: int) -> None:
+        """Add the resources of ``list_name`` from position ``start`` to its indexes."""
+        resources = getattr(self, list_name)
+        for index_name, keys in _INDEXES.get(list_name, {}).items():
+            index = getattr(self, index_name)
+            for position in range(start, len(resources)):
+                for key in keys(resources[position]):
+                    index[key].append(position)
+
+    def _find_conditions(
+        self,
+        codes: Optional[Iterable[str]] = None,
+        prefixes: Optional[PrefixTable] = None,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+    ) -> List[ConditionRecord]:
+        """
+        Look up conditions through the code indexes.
+
+        Args:
+            codes (Optional[Iterable[str]]): Exact condition codes to match.
+            prefixes (Optional[PrefixTable]): ICD prefixes to match.
+            status (Optional[str]): Required clinical status, if any.
+            category (Optional[str]): Required category code, if any.
+
+        Returns:
+            List[ConditionRecord]: Matching conditions in bundle order. Only
+                when both ``codes`` and ``prefixes`` are None is every
+                condition a candidate; an empty code list matches nothing.
+        """
+        positions = set()
+        for code in codes or ():
+            positions.update(self._condition_codes.get(code, ()))
+        if prefixes is not None:
+            for icd_category in prefixes.categories:
+                positions.update(
+                    i
+                    for i in self._condition_prefixes.get(icd_category, ())
+                    if prefixes.matches(self.conditions[i].code)
+                )
+        if codes is None and prefixes is None:
+            positions.update(range(len(self.conditions)))
+        if status is not None:
+            positions.intersection_update(self._condition_statuses.get(status, ()))
+        if category is not None:
+            positions.intersection_update(
+                self._condition_categories.get(category, ())
+            )
+        return [self.conditions[i] for i in sorted(positions)]
+
+    def _find_procedures(self, codes: Iterable[str]) -> List[ProcedureRecord]:
+        """Look up procedures by code, in bundle order."""
+        return [
+            self.procedures[i]
+            for i in _positions_for(self._procedure_codes, codes)
+        ]
+
+    def _find_observations(self, *codes: str) -> List[ObservationRecord]:
+        """Look up observations by LOINC code, in bundle order."""
+        return [
+            self.observations[i]
+            for i in _positions_for(self._observation_codes, codes)
+        ]
+
+    def _find_reports(self, *codes: str) -> List[DiagnosticReportRecord]:
+        """Look up diagnostic reports by LOINC code, in bundle order."""
+        return [
+            self.diagnostic_reports[i]
+            for i in _positions_for(self._report_codes, codes)
+        ]
 
     def check_eligibility(self) -> Tuple[bool, List[str]]:
         """
@@ -124,120 +334,159 @@ class InsuranceCalculator:
                 - List[str]: List of disqualifying reasons if not eligible.
         """
         self.disqualifying_conditions = []
+        for name, _, _ in _ELIGIBILITY_CHECKS:
+            self.disqualifying_conditions.extend(self._check_result(name))
+        return (len(self.disqualifying_conditions) == 0, self.disqualifying_conditions)
 
-        # 1. Age-based eligibility (over 85 disqualifies)
-        if self._calculate_patient_age() > 85:
-            self.disqualifying_conditions.append("Applicant over 85 years old")
-
-        # 2. Active terminal conditions (e.g., specific cancers)
-        terminal_codes = [
-            "C34.90",  # Lung cancer
-            "C61.9",  # Prostate cancer
-            "C50.919",  # Breast cancer
-            "C18.9",  # Colon cancer
-            "C91.00",  # Acute lymphoblastic leukemia
-        ]
-        for condition in self.conditions:
-            code = condition.code.coding[0].code
-            status = condition.clinicalStatus.coding[0].code
-            if code in terminal_codes and status == "active":
-                self.disqualifying_conditions.append(
-                    f"Active terminal condition: {code}"
+    def is_eligible(self, order: Optional[Iterable[str]] = None) -> bool:
+        """
+        Fail-fast eligibility: stop at the first disqualifying check.
+
+        For triage, where only a yes/no answer is needed. Use
+        ``check_eligibility()`` when the full list of reasons is required,
+        e.g. for adverse-action letters; results of checks already run here
+        are reused by it.
+
+        Args:
+            order (Optional[Iterable[str]]): Check names in evaluation order,
+                e.g. from ``eligibility_order(metrics)``. Must name every
+                check exactly once. Defaults to ``FAST_ELIGIBILITY_ORDER``.
+
+        Returns:
+            bool: True if eligible, False otherwise.
+
+        Raises:
+            ValueError: If ``order`` does not name every check exactly once.
+        """
+        if order is None:
+            order = FAST_ELIGIBILITY_ORDER
+        else:
+            order = tuple(order)
+            if sorted(order) != sorted(_CHECKS_BY_NAME):
+                raise ValueError("Check order must name every eligibility check once")
+        for name in order:
+            if self._check_result(name):
+                return False
+        return True
+
+    def _check_result(self, name: str) -> List[str]:
+        """Disqualifying reasons found by one eligibility check, cached."""
+        reasons = self._check_results.get(name)
+        if reasons is None:
+            if self.metrics is None:
+                reasons = _CHECKS_BY_NAME[name](self)
+            else:
+                start = time.perf_counter()
+                reasons = _CHECKS_BY_NAME[name](self)
+                self.metrics.record(
+                    "eligibility", name, time.perf_counter() - start, bool(reasons)
                 )
+            self._check_results[name] = reasons
+        return reasons
+
+    # Eligibility checks ------------------------------------------------------
+    def _check_age(self) -> List[str]:
+        """1. Age-based eligibility (over 85 disqualifies)."""
+        if self.patient is None or not self.patient.birth_date:
+            return ["Missing patient birth date"]
+        if self._calculate_patient_age() > self.rules.max_age:
+            return [f"Applicant over {self.rules.max_age} years old"]
+        return []
+
+    def _check_terminal_conditions(self) -> List[str]:
+        """2. Active terminal conditions (e.g., specific cancers)."""
+        return [
+            f"Active terminal condition: {condition.code}"
+            for condition in self._find_conditions(
+                self.rules.terminal_codes, status="active"
+            )
+        ]
 
-        # 3. Recent major surgeries (within 6 months)
-        recent_surgeries = [
-            "27447",  # Coronary artery bypass graft (CABG)
-            "33533",  # Heart transplant
-            "50360",  # Kidney transplant
+    def _check_recent_surgery(self) -> List[str]:
+        """3. Recent major surgeries (within 6 months)."""
+        return [
+            "Recent major surgery"
+            for procedure in self._find_procedures(self.rules.recent_surgery_codes)
+            if self._days_ago(procedure.performed) < self.rules.recent_window_days
         ]
-        for procedure in self.procedures:
-            if self._days_ago(procedure.performedDateTime) < 180:
-                if procedure.code.coding[0].code in recent_surgeries:
-                    self.disqualifying_conditions.append(
-                        "Recent major surgery")
-
-        # 4. Unmanaged chronic conditions (diabetes, hypertension)
-        chronic_conditions = ["E11.9", "I10"]  # Diabetes, hypertension
+
+    def _check_unmanaged_chronic(self) -> List[str]:
+        """4. Unmanaged chronic conditions (diabetes, hypertension)."""
         uncontrolled = []
-        for condition in self.conditions:
-            if condition.code.coding[0].code in chronic_conditions:
-                management = self._get_management_checks(condition)
-                if (
-                    sum(management.values()) < 2
-                ):  # Less than 2/3 management criteria met
-                    uncontrolled.append(condition.code.coding[0].code)
+        for condition in self._find_conditions(self.rules.managed_chronic_codes):
+            management = self._get_management_checks(condition)
+            if sum(management.values()) < self.rules.min_management_checks:
+                uncontrolled.append(condition.code)
         if uncontrolled:
-            self.disqualifying_conditions.append(
-                f"Unmanaged chronic conditions: {', '.join(uncontrolled)}"
-            )
+            return [f"Unmanaged chronic conditions: {', '.join(uncontrolled)}"]
+        return []
 
-        # 5. High-risk pregnancy
+    def _check_high_risk_pregnancy(self) -> List[str]:
+        """5. High-risk pregnancy."""
         if self._is_pregnant() and self._is_high_risk_pregnancy():
-            self.disqualifying_conditions.append("High-risk pregnancy")
-
-        # 6. Recent heart attack (within 6 months)
-        for condition in self.conditions:
-            code = condition.code.coding[0].code
-            status = condition.clinicalStatus.coding[0].code
-            if code.startswith("I21") and status == "active":
-                if self._days_ago(condition.onsetDateTime) < 180:
-                    self.disqualifying_conditions.append("Recent heart attack")
-
-        # 7. End-stage renal disease
-        for condition in self.conditions:
-            if (
-                condition.code.coding[0].code == "N18.6"
-                and condition.clinicalStatus.coding[0].code == "active"
-            ):
-                self.disqualifying_conditions.append("End-stage renal disease")
+            return ["High-risk pregnancy"]
+        return []
+
+    def _check_recent_heart_attack(self) -> List[str]:
+        """6. Recent heart attack (within 6 months)."""
+        return [
+            "Recent heart attack"
+            for condition in self._find_conditions(
+                prefixes=self.rules.heart_attack_prefixes, status="active"
+            )
+            if self._days_ago(condition.onset) < self.rules.recent_window_days
+        ]
 
-        # 8. Active cancer treatment
-        if self._has_active_cancer_treatment():
-            self.disqualifying_conditions.append("Active cancer treatment")
+    def _check_end_stage_renal(self) -> List[str]:
+        """7. End-stage renal disease."""
+        return [
+            "End-stage renal disease"
+            for _ in self._find_conditions(
+                self.rules.end_stage_renal_codes, status="active"
+            )
+        ]
 
-        # 9. Severe mental health conditions
-        # Schizophrenia, bipolar, severe depression
-        mental_health_codes = ["F20", "F31", "F32.5", "F33.3"]
-        for condition in self.conditions:
-            if (
-                condition.code.coding[0].code in mental_health_codes
-                and condition.clinicalStatus.coding[0].code == "active"
-            ):
-                self.disqualifying_conditions.append(
-                    f"Severe mental health condition: {condition.code.coding[0].code}"
-                )
+    def _check_cancer_treatment(self) -> List[str]:
+        """8. Active cancer treatment."""
+        if self._has_active_cancer_treatment():
+            return ["Active cancer treatment"]
+        return []
+
+    def _check_mental_health(self) -> List[str]:
+        """9. Severe mental health conditions."""
+        return [
+            f"Severe mental health condition: {condition.code}"
+            for condition in self._find_conditions(
+                self.rules.mental_health_codes, status="active"
+            )
+        ]
 
-        # 10. Active substance abuse
-        substance_abuse_codes = [
-            f"F{num}" for num in range(10, 20)]  # F10-F19 codes
-        for condition in self.conditions:
-            code_prefix = condition.code.coding[0].code[:3]
-            if (
-                code_prefix in substance_abuse_codes
-                and condition.clinicalStatus.coding[0].code == "active"
-            ):
-                self.disqualifying_conditions.append(
-                    f"Active substance abuse: {condition.code.coding[0].code}"
-                )
+    def _check_substance_abuse(self) -> List[str]:
+        """10. Active substance abuse."""
+        return [
+            f"Active substance abuse: {condition.code}"
+            for condition in self._find_conditions(
+                prefixes=self.rules.substance_abuse_prefixes, status="active"
+            )
+        ]
 
-        # 11. Recent organ transplant (within 6 months)
-        transplant_codes = ["33533", "50360"]  # Heart and kidney transplants
-        for procedure in self.procedures:
-            if (
-                procedure.code.coding[0].code in transplant_codes
-                and self._days_ago(procedure.performedDateTime) < 180
-            ):
-                self.disqualifying_conditions.append("Recent organ transplant")
+    def _check_recent_transplant(self) -> List[str]:
+        """11. Recent organ transplant (within 6 months)."""
+        return [
+            "Recent organ transplant"
+            for procedure in self._find_procedures(self.rules.transplant_codes)
+            if self._days_ago(procedure.performed) < self.rules.recent_window_days
+        ]
 
-        # 12. Experimental treatment participation
+    def _check_experimental_treatment(self) -> List[str]:
+        """12. Experimental treatment participation."""
         if self._in_experimental_treatment():
-            self.disqualifying_conditions.append(
-                "Experimental treatment participation")
+            return ["Experimental treatment participation"]
+        return []
 
-        return (len(self.disqualifying_conditions) == 0, self.disqualifying_conditions)
-
-    def calculate_premium(self) -> Optional[float]:
+    def calculate_premium(
+        self, base_premium: Optional[float] = None, trace: bool = False
+    ) -> Union[float, "PremiumTrace", None]:
         """
         Calculate the adjusted monthly insurance premium based on risk factors.
 
@@ -245,87 +494,297 @@ class InsuranceCalculator:
         as age, BMI, chronic conditions, lifestyle choices, medication adherence,
         and preventive care.
 
+        The quote has no side effects beyond caching: eligibility, facts and
+        the multiplier are computed once per instance, so repeated calls and
+        what-if base premiums are cheap and always return the same result.
+
+        Args:
+            base_premium (Optional[float]): Base monthly premium to price
+                against. Defaults to ``self.base_premium``.
+            trace (bool): Return a ``PremiumTrace`` explaining every applied
+                multiplier instead of the bare premium.
+
         Returns:
-            float: The calculated monthly premium. Returns None if the patient is
-                   not eligible for insurance.
+            float: The calculated monthly premium, or its ``PremiumTrace`` when
+                   ``trace`` is set. Returns None if the patient is not
+                   eligible for insurance.
         """
         if not self.check_eligibility()[0]:
             return None
+        if self._multiplier is None:
+            self._applied_factors = self._applied_premium_factors(
+                self._premium_facts()
+            )
+            self._multiplier = _product(self._applied_factors)
+        self.risk_multiplier = self._multiplier
+        if base_premium is None:
+            base_premium = self.base_premium
+        premium = round(base_premium * self._multiplier, 2)
+        if trace:
+            return self._premium_trace(base_premium, premium)
+        return premium
+
+    def _premium_trace(self, base_premium: float, premium: float) -> "PremiumTrace":
+        """
+        Explain a computed premium from the cached facts and factors.
 
-        age = self._calculate_patient_age()
-        # Age-based adjustments
-        if age > 65:
-            self.risk_multiplier *= 1.6  # Significant risk increase for seniors
-        elif age > 50:
-            self.risk_multiplier *= 1.3  # Moderate risk increase for age 50-65
-
-        # BMI-based adjustments
-        bmi = self._calculate_bmi()
-        if bmi and bmi > 35:
-            self.risk_multiplier *= 1.25  # High obesity risk
-        elif bmi and bmi > 30:
-            self.risk_multiplier *= 1.15  # Obesity risk
-
-        # Chronic condition count adjustment
-        chronic_count = sum(
-            1
-            for c in self.conditions
-            if c.clinicalStatus.coding[0].code == "active"
-            and any(cat.coding[0].code == "chronic" for cat in c.category)
+        No rule is re-evaluated: the applied factors, fact values and source
+        records are the ones captured when the premium was computed.
+        """
+        adjustments = [
+            PremiumAdjustment(
+                factor=factor.name,
+                fact=factor.fact,
+                value=self._fact_values.get(factor.fact),
+                condition=f"{factor.fact} {factor.op} {factor.value!r}",
+                multiplier=factor.multiplier,
+                source_ids=_references(self._fact_sources.get(factor.fact, ())),
+            )
+            for factor in self._applied_factors
+        ]
+        return PremiumTrace(
+            base_premium=base_premium,
+            multiplier=self._multiplier,
+            premium=premium,
+            adjustments=adjustments,
+        )
+
+    def _premium_multiplier(self, facts: Dict[str, object]) -> float:
+        """
+        Combine the premium factors that hold for a set of facts.
+
+        Args:
+            facts (Dict[str, object]): Fact values keyed by fact name.
+
+        Returns:
+            float: The product of the applicable multipliers.
+        """
+        return _product(self._applied_premium_factors(facts))
+
+    def _applied_premium_factors(
+        self, facts: Dict[str, object]
+    ) -> List[PremiumFactor]:
+        """
+        Select the premium factors that hold for a set of facts.
+
+        Factors are evaluated in rule-set order; within a factor group only the
+        first matching factor applies.
+
+        Args:
+            facts (Dict[str, object]): Fact values keyed by fact name.
+
+        Returns:
+            List[PremiumFactor]: Applicable factors, in rule-set order.
+        """
+        applied = []
+        applied_groups = set()
+        metrics = self.metrics
+        for factor in self.rules.premium_factors:
+            if factor.group in applied_groups:
+                continue
+            if metrics is None:
+                applies = factor.applies(facts)
+            else:
+                start = time.perf_counter()
+                applies = factor.applies(facts)
+                metrics.record(
+                    "premium_factor", factor.name, time.perf_counter() - start, applies
+                )
+            if applies:
+                applied.append(factor)
+                if factor.group is not None:
+                    applied_groups.add(factor.group)
+        return applied
+
+    def _premium_facts(
+        self, names: Optional[Iterable[str]] = None
+    ) -> Dict[str, object]:
+        """
+        Extract the patient facts that premium factors are evaluated against.
+
+        Each fact is computed once and cached until its inputs change,
+        together with the records it was derived from.
+
+        Args:
+            names (Optional[Iterable[str]]): Facts to extract. Defaults to
+                every known fact.
+
+        Returns:
+            Dict[str, object]: Fact values keyed by the names used in the
+                rule set's premium factors.
+        """
+        if names is None:
+            names = _PREMIUM_FACTS
+        for name in names:
+            if name in self._fact_values:
+                continue
+            compute, _ = _PREMIUM_FACTS[name]
+            if self.metrics is None:
+                value, sources = compute(self)
+            else:
+                start = time.perf_counter()
+                value, sources = compute(self)
+                self.metrics.record(
+                    "premium_fact", name, time.perf_counter() - start, bool(value)
+                )
+            self._fact_values[name] = value
+            self._fact_sources[name] = sources
+        return {name: self._fact_values[name] for name in names}
+
+    def quote_scenario(
+        self,
+        overrides: Mapping[str, object],
+        base_premium: Optional[float] = None,
+    ) -> Optional[float]:
+        """
+        Price the applicant with some premium facts replaced.
+
+        The parsed bundle, indexes and cached facts are reused; only the
+        premium factors are re-evaluated. Overrides never change eligibility.
+
+        Facts derived from an overridden value are recomputed unless they
+        are overridden themselves: ``preventive_care_complete`` follows
+        ``vaccinations_complete``, and ``bmi`` follows the scenario inputs
+        ``height`` (cm) and ``weight`` (kg).
+
+        Args:
+            overrides (Mapping[str, object]): Fact values to use instead of
+                the computed ones, e.g. ``{"smoker": False}``, and scenario
+                inputs such as ``{"weight": 80}``.
+            base_premium (Optional[float]): Base monthly premium to price
+                against. Defaults to ``self.base_premium``.
+
+        Returns:
+            Optional[float]: The scenario premium, or None if the patient is
+                not eligible for insurance.
+
+        Raises:
+            ValueError: If an override names an unknown fact.
+        """
+        unknown = set(overrides) - set(_PREMIUM_FACTS) - _SCENARIO_INPUTS
+        if unknown:
+            raise ValueError(f"Unknown premium facts: {', '.join(sorted(unknown))}")
+        if not self.check_eligibility()[0]:
+            return None
+        if base_premium is None:
+            base_premium = self.base_premium
+        facts = self._premium_facts()
+        facts.update(
+            (name, value) for name, value in overrides.items() if name in facts
+        )
+        for name, (depends_on, derive) in _SCENARIO_DERIVED.items():
+            if name not in overrides and not depends_on.isdisjoint(overrides):
+                facts[name] = derive(self, facts, overrides)
+        return round(base_premium * self._premium_multiplier(facts), 2)
+
+    def price_scenarios(
+        self,
+        scenarios: Mapping[str, Mapping[str, object]],
+        base_premium: Optional[float] = None,
+    ) -> Dict[str, Optional[float]]:
+        """
+        Price many what-if scenarios against one parsed bundle.
+
+        Example:
+            calculator.price_scenarios({
+                "quit_smoking": {"smoker": False},
+                "lower_ldl": {"ldl": 120},
+                "vaccinated": {"vaccinations_complete": True},
+            })
+
+        Args:
+            scenarios (Mapping[str, Mapping[str, object]]): Fact overrides
+                keyed by scenario name.
+            base_premium (Optional[float]): Base monthly premium to price
+                against. Defaults to ``self.base_premium``.
+
+        Returns:
+            Dict[str, Optional[float]]: Premium per scenario name, plus the
+                unmodified premium under "baseline" unless a scenario uses
+                that name. Premiums are None if the patient is not eligible.
+
+        Raises:
+            ValueError: If a scenario overrides an unknown fact.
+        """
+        prices = {"baseline": self.calculate_premium(base_premium)}
+        for name, overrides in scenarios.items():
+            prices[name] = self.quote_scenario(overrides, base_premium)
+        return prices
+
+    def add_resources(self, resources: Iterable[Dict]) -> "EvaluationDelta":
+        """
+        Add FHIR resources to an evaluated patient and re-price incrementally.
+
+        Indexes are extended in place, and only the eligibility checks and
+        premium facts that read an affected resource list are recomputed.
+
+        Args:
+            resources (Iterable[Dict]): New FHIR resources for this patient,
+                e.g. an Observation or Encounter that just arrived.
+
+        Returns:
+            EvaluationDelta: Eligibility, reasons and premium before and after.
+        """
+        eligible_before, reasons_before = self.check_eligibility()
+        reasons_before = list(reasons_before)
+        facts_before = self._premium_facts()
+        premium_before = self.calculate_premium()
+
+        sizes = {list_name: len(getattr(self, list_name)) for list_name in _INDEXES}
+        changed = set()
+        for resource in resources:
+            added_to = self._add_resource(resource)
+            if added_to is not None:
+                changed.add(added_to)
+        for list_name in changed & set(_INDEXES):
+            self._index_resources(list_name, sizes[list_name])
+
+        recomputed = [
+            name for name, _, inputs in _ELIGIBILITY_CHECKS if inputs & changed
+        ]
+        for name in recomputed:
+            self._check_results.pop(name, None)
+        stale_facts = [
+            name for name, (_, inputs) in _PREMIUM_FACTS.items() if inputs & changed
+        ]
+        for name in stale_facts:
+            self._fact_values.pop(name, None)
+            self._fact_sources.pop(name, None)
+        if stale_facts:
+            self._applied_factors = None
+            self._multiplier = None
+        for key in [
+            key for key in self._derived if _DERIVED_INPUTS[key[0]] & changed
+        ]:
+            del self._derived[key]
+
+        eligible_after, reasons_after = self.check_eligibility()
+        facts_after = self._premium_facts()
+        return EvaluationDelta(
+            eligible_before=eligible_before,
+            eligible_after=eligible_after,
+            premium_before=premium_before,
+            premium_after=self.calculate_premium(),
+            reasons_added=list(
+                (Counter(reasons_after) - Counter(reasons_before)).elements()
+            ),
+            reasons_removed=list(
+                (Counter(reasons_before) - Counter(reasons_after)).elements()
+            ),
+            changed_facts={
+                name: (facts_before[name], facts_after[name])
+                for name in stale_facts
+                if facts_before[name] != facts_after[name]
+            },
+            recomputed=recomputed + stale_facts,
         )
-        if chronic_count > 2:
-            self.risk_multiplier *= 1.35  # Multiple chronic conditions
-
-        # Lifestyle factors
-        if self._is_smoker():
-            self.risk_multiplier *= 1.6  # Tobacco use
-        if self._is_drinker():
-            self.risk_multiplier *= 1.5  # Alcohol use
-
-        # Health metrics
-        if self._has_high_ldl():
-            self.risk_multiplier *= 1.15  # Elevated cholesterol
-        if self._has_family_history_heart_disease():
-            self.risk_multiplier *= 1.2  # Family history of heart disease
-
-        # Healthcare utilization patterns
-        if self._has_frequent_er_visits():
-            self.risk_multiplier *= 1.25  # Frequent ER visits
-
-        # Environmental risk factors
-        if self._has_high_risk_occupation():
-            self.risk_multiplier *= 1.15  # Dangerous occupation
-        if self._lives_in_high_pollution_area():
-            self.risk_multiplier *= 1.1  # High pollution area
-
-        # Medication adherence check
-        for condition in self.conditions:
-            if any("chronic" in [cat.coding[0].code for cat in condition.category]):
-                management = self._get_management_checks(condition)
-                if not management.get("medication_adherence"):
-                    self.risk_multiplier *= 1.2  # Poor medication adherence
-                    break
-
-        # High-risk medication use
-        if self._uses_high_risk_meds():
-            self.risk_multiplier *= 1.2  # Medications with significant side effects
-
-        # Preventive care status
-        preventive = self._has_preventive_care()
-        if not preventive.get("vaccinations"):
-            self.risk_multiplier *= 1.1  # Missing required vaccinations
-
-        # Positive preventive care adjustment
-        if preventive.get("overall"):
-            self.risk_multiplier *= 0.95  # Discount for comprehensive preventive care
-
-        return round(self.base_premium * self.risk_multiplier, 2)
 
     # Helper methods ----------------------------------------------------------
+    @_derived("patient")
     def _calculate_patient_age(self) -> int:
         """Calculate the patient's current age based on birthDate."""
-        birth_date = datetime.strptime(self.patient.birthDate, "%Y-%m-%d")
-        today = datetime.today()
+        birth_date = self._parse_date(self.patient.birth_date)
+        today = self.as_of
         return (
             today.year
             - birth_date.year
@@ -334,287 +793,878 @@ class InsuranceCalculator:
 
     def _get_observation_value(self, code: str) -> Optional[float]:
         """Get latest numerical observation value by LOINC code."""
-        for obs in reversed(self.observations):
-            if obs.code.coding[0].code == code:
-                return float(obs.valueQuantity.value)
-        return None
+        _, values, _ = self._observation_series(code)
+        return values[-1] if values else None
 
-    def _calculate_bmi(self) -> Optional[float]:
-        """Calculate BMI from height and weight observations."""
-        height = self._get_observation_value("8302-2")  # LOINC code for height
-        weight = self._get_observation_value(
-            "29463-7")  # LOINC code for weight
-        return weight / ((height / 100) ** 2) if height and weight else None
-
-    def _is_smoker(self) -> bool:
-        """Check smoking status via tobacco use observation."""
-        smoking_code = "72166-2"  # LOINC code for tobacco smoking status
-        for obs in self.observations:
-            if obs.code.coding[0].code == smoking_code and obs.valueCodeableConcept:
-                return "smok" in obs.valueCodeableConcept.text.lower()
-        return False
-
-    def _is_drinker(self) -> bool:
-        """Check alcohol consumption status."""
-        alcohol_code = "74013-4"  # LOINC code for alcohol use
-        for obs in self.observations:
-            if obs.code.coding[0].code == alcohol_code and obs.valueCodeableConcept:
-                return obs.valueCodeableConcept.text.lower() in ["yes", "current"]
-        return any(
-            c.code.coding[0].code in ["F10.10", "F10.20"] for c in self.conditions
-        )
+    @_derived("observations")
+    def _observation_series(
+        self, code: str
+    ) -> Tuple[List[datetime], List[Optional[float]], List[int]]:
+        """
+        Time-sorted effective dates and values of one LOINC code.
 
-    def _has_high_ldl(self) -> bool:
-        """Check for elevated LDL cholesterol (>190 mg/dL)."""
-        ldl = self._get_observation_value("18262-6")  # LDL cholesterol code
-        return ldl >= 190 if ldl else False
+        Observations without an effective date sort first, as if ancient, and
+        ties keep bundle order, so the last entry is the latest observation
+        even when the bundle lists observations out of order.
 
-    def _has_family_history_heart_disease(self) -> bool:
-        """Check for family history of heart disease."""
-        return any(
-            c.code.coding[0].code in ["Z82.49", "Z82.41"] for c in self.conditions
+        Args:
+            code (str): LOINC code.
+
+        Returns:
+            Tuple[List[datetime], List[Optional[float]], List[int]]: Parallel
+                lists of effective dates, values and positions in
+                ``self.observations``, oldest first.
+        """
+        series = []
+        for position in self._observation_codes.get(code, ()):
+            effective = self.observations[position].effective
+            date = self._parse_date(effective) if effective else datetime.min
+            series.append((date, position))
+        series.sort()
+        return (
+            [date for date, _ in series],
+            [self.observations[position].value for _, position in series],
+            [position for _, position in series],
         )
 
-    def _has_frequent_er_visits(self) -> bool:
-        """Check for 3+ ER visits in the last year."""
-        er_visits = [
-            e for e in self.encounters if e.type[0].coding[0].code == "ER"]
-        return sum(1 for e in er_visits if self._days_ago(e.period.start) < 365) >= 3
+    def _latest_observation(self, code: str) -> Optional[ObservationRecord]:
+        """Latest observation of one LOINC code, by effective date."""
+        positions = self._observation_series(code)[2]
+        return self.observations[positions[-1]] if positions else None
+
+    def _has_observation_within(self, codes: Iterable[str], days: int) -> bool:
+        """Check for an observation of any of ``codes`` less than ``days`` old."""
+        return self._latest_observation_within(codes, days) is not None
+
+    def _latest_observation_within(
+        self, codes: Iterable[str], days: int
+    ) -> Optional[ObservationRecord]:
+        """
+        Find an observation of any of ``codes`` less than ``days`` old.
+
+        Matches ``_days_ago(effective) < days`` with a binary search over each
+        code's time series; observations without a date never match.
+
+        Returns:
+            Optional[ObservationRecord]: The latest matching observation of
+                the first code that has one, or None.
+        """
+        cutoff = self.as_of - timedelta(days=days)
+        for code in codes:
+            dates, _, positions = self._observation_series(code)
+            if bisect_right(dates, cutoff) < len(dates):
+                return self.observations[positions[-1]]
+        return None
+
+    @_derived("observations")
+    def _bmi_fact(self) -> Tuple[Optional[float], List[ObservationRecord]]:
+        """Calculate BMI from the latest height and weight observations."""
+        height = self._latest_observation(self.rules.observation_codes["height"])
+        weight = self._latest_observation(self.rules.observation_codes["weight"])
+        if height is None or weight is None or not height.value or not weight.value:
+            return None, []
+        return weight.value / ((height.value / 100) ** 2), [height, weight]
+
+    def _smoker_fact(self) -> Tuple[bool, List[ObservationRecord]]:
+        """Check smoking status via the first answered tobacco use observation."""
+        for obs in self._find_observations(self.rules.observation_codes["smoking"]):
+            if obs.value_text is not None:
+                return self.rules.smoker_term in obs.value_text.lower(), [obs]
+        return False, []
+
+    def _drinker_fact(self) -> Tuple[bool, List[FhirRecord]]:
+        """Check alcohol consumption status."""
+        for obs in self._find_observations(self.rules.observation_codes["alcohol"]):
+            if obs.value_text is not None:
+                return obs.value_text.lower() in self.rules.drinker_answers, [obs]
+        conditions = self._find_conditions(self.rules.alcohol_condition_codes)
+        return bool(conditions), conditions
+
+    def _family_history_heart_disease_fact(self) -> Tuple[bool, List[ConditionRecord]]:
+        """Check for family history of heart disease."""
+        conditions = self._find_conditions(self.rules.family_history_codes)
+        return bool(conditions), conditions
+
+    def _er_visits_fact(self) -> Tuple[int, List[EncounterRecord]]:
+        """Count ER visits within the rule set's look-back window."""
+        visits = [
+            e
+            for e in self.encounters
+            if e.type_code == self.rules.er_encounter_code
+            and self._days_ago(e.start) < self.rules.er_window_days
+        ]
+        return len(visits), visits
 
-    def _has_high_risk_occupation(self) -> bool:
+    def _high_risk_occupation_fact(self) -> Tuple[bool, List[ObservationRecord]]:
         """Check for high-risk occupations."""
-        occupation_code = "67875-1"  # LOINC occupation code
-        risky_jobs = {"construction", "firefighter", "police", "miner"}
-        for obs in self.observations:
-            if (
-                obs.code.coding[0].code == occupation_code
-                and obs.valueString.lower() in risky_jobs
-            ):
-                return True
-        return False
+        matches = [
+            obs
+            for obs in self._find_observations(
+                self.rules.observation_codes["occupation"]
+            )
+            if (obs.value_string or "").lower() in self.rules.risky_jobs
+        ]
+        return bool(matches), matches
 
-    def _lives_in_high_pollution_area(self) -> bool:
+    def _high_pollution_area_fact(self) -> Tuple[bool, List[PatientRecord]]:
         """Check residence in high pollution ZIP codes."""
-        high_pollution_zips = {"10001", "90001", "60601"}
-        return any(
-            addr.postalCode in high_pollution_zips for addr in self.patient.address
+        polluted = any(
+            postal_code in self.rules.high_pollution_zips
+            for postal_code in self.patient.postal_codes
         )
+        return polluted, [self.patient] if polluted else []
+
+    def _poor_medication_adherence_fact(self) -> Tuple[bool, List[ConditionRecord]]:
+        """Check whether any chronic condition lacks medication adherence."""
+        lacking = [
+            condition
+            for condition in self._find_conditions(category="chronic")
+            if not self._get_management_checks(condition).get("medication_adherence")
+        ]
+        return bool(lacking), lacking
 
-    def _get_management_checks(self, condition: Condition) -> Dict[str, bool]:
+    def _get_management_checks(self, condition: ConditionRecord) -> Dict[str, bool]:
         """Evaluate management status for a chronic condition."""
-        checks = {
-            "provider_visit": False,
-            "medication_adherence": False,
-            "lab_monitoring": False,
+        return self._management_matrix()[condition.code]
+
+    @_derived(*_MANAGEMENT_INPUTS)
+    def _management_matrix(self) -> Dict[str, Dict[str, bool]]:
+        """
+        Management checks for every condition code of the patient at once.
+
+        Encounters and medications are each scanned once, crediting every
+        condition code they list as a reason; lab monitoring uses the
+        observation time series.
+
+        Returns:
+            Dict[str, Dict[str, bool]]: Checks ("provider_visit",
+                "medication_adherence", "lab_monitoring") per condition code.
+        """
+        rules = self.rules
+        matrix = {
+            code: {
+                "provider_visit": False,
+                "medication_adherence": False,
+                "lab_monitoring": False,
+            }
+            for code in self._condition_codes
         }
-        condition_code = condition.code.coding[0].code
 
         # 1. Provider visit check (same condition documented in encounters)
         for enc in self.encounters:
-            if self._days_ago(enc.period.start) < 365:
-                # Check if encounter was for this specific condition
-                if any(
-                    coding.code == condition_code for coding in enc.reasonCode[0].coding
-                ):
-                    checks["provider_visit"] = True
-                    break
-
-        # 2. Medication adherence check
-        condition_meds = [
-            med
-            for med in self.medications
-            if any(coding.code == condition_code for coding in med.reasonCode[0].coding)
-        ]
-        if condition_meds:
-            # Active prescriptions within last year
-            active_meds = [
-                med
-                for med in condition_meds
-                if med.status == "active"
-                and self._days_ago(med.authoredOn) < 365
-            ]
-            checks["medication_adherence"] = len(active_meds) > 0
+            if self._days_ago(enc.start) < rules.provider_visit_window_days:
+                for code in enc.reason_codes:
+                    if code in matrix:
+                        matrix[code]["provider_visit"] = True
+
+        # 2. Medication adherence check (active prescriptions within last year)
+        for med in self.medications:
+            if (
+                med.status == "active"
+                and self._days_ago(med.authored_on) < rules.medication_window_days
+            ):
+                for code in med.reason_codes:
+                    if code in matrix:
+                        matrix[code]["medication_adherence"] = True
 
         # 3. Lab monitoring check
-        lab_requirements = {
-            "E11.9": {  # Type 2 diabetes
-                "codes": ["4548-4", "2345-7"],  # HbA1c  # Blood glucose
-                "frequency": 180,
-            },
-            "I10": {  # Essential hypertension
-                "codes": ["55284-4"],  # Blood pressure panel
-                "frequency": 90,
-            },
-        }
-        if condition_code in lab_requirements:
-            reqs = lab_requirements[condition_code]
-            checks["lab_monitoring"] = any(
-                obs.code.coding[0].code in reqs["codes"]
-                and self._days_ago(obs.effectiveDateTime) < reqs["frequency"]
-                for obs in self.observations
-            )
+        for code, checks in matrix.items():
+            reqs = rules.lab_requirements.get(code)
+            if reqs is not None:
+                checks["lab_monitoring"] = self._has_observation_within(
+                    reqs.codes, reqs.frequency
+                )
 
-        return checks
+        return matrix
 
-    def _uses_high_risk_meds(self) -> bool:
+    def _high_risk_medications_fact(self) -> Tuple[bool, List[MedicationRecord]]:
         """Check for medications with significant risk profiles."""
-        high_risk_meds = {
-            "warfarin",  # Anticoagulant - bleeding risk
-            "insulin",  # Hypoglycemia risk
-            "chemotherapy",
-            "antipsychotic",
-            "immunosuppressant",
-        }
-        for med in self.medications:
-            if med.medicationCodeableConcept.text:
-                name = med.medicationCodeableConcept.text.lower()
-                if any(hr_term in name for hr_term in high_risk_meds):
-                    return True
-        return False
+        terms = self.rules.high_risk_med_terms
+        meds = [
+            med
+            for med in self.medications
+            if med.name and any(term in med.name.lower() for term in terms)
+        ]
+        return bool(meds), meds
 
     def _has_preventive_care(self) -> dict:
         """Evaluate completion of recommended preventive care measures."""
+        return self._preventive_care()[0]
+
+    @_derived(*_PREVENTIVE_INPUTS)
+    def _preventive_care(self) -> Tuple[Dict[str, bool], Dict[str, List[FhirRecord]]]:
+        """
+        Evaluate preventive care, keeping the records behind each check.
+
+        Returns:
+            Tuple[Dict[str, bool], Dict[str, List[FhirRecord]]]: Checks
+                ("vaccinations", "screenings", "wellness_visit", "overall")
+                and, per check, the records that satisfied it.
+        """
         checks = {"vaccinations": False,
                   "screenings": False, "wellness_visit": False}
+        age = self._calculate_patient_age()
 
-        # Vaccination check
-        required_vaccines = self._get_required_vaccines()
-        received_vaccines = {
-            imm.vaccineCode.coding[0].code
+        # Vaccination check; the patient's demographics decide what is required
+        required = self._get_required_vaccines()
+        recent = [
+            imm
             for imm in self.immunizations
-            if self._days_ago(imm.occurrenceDateTime) < 366
-        }
+            if self._days_ago(imm.occurred) < self.rules.vaccine_window_days
+        ]
+        received_vaccines = {imm.vaccine_code for imm in recent}
         checks["vaccinations"] = all(
-            vax in received_vaccines for vax in required_vaccines
+            not vaccine.codes.isdisjoint(received_vaccines) for vaccine in required
         )
+        vaccinations = [self.patient] + [
+            imm
+            for imm in recent
+            if any(imm.vaccine_code in vaccine.codes for vaccine in required)
+        ]
 
         # Screening check
-        checks["screenings"] = self._has_required_screenings(
-            self._calculate_patient_age(), self.patient.gender
+        checks["screenings"], screenings = self._required_screenings(
+            age, self.patient.gender
         )
 
-        # Wellness visit check (CPT 185347001 - Annual wellness visit)
-        checks["wellness_visit"] = any(
-            enc.type[0].coding[0].code == "185347001"
-            and self._days_ago(enc.period.start) < 730
+        # Wellness visit check (annual wellness visit encounter)
+        wellness = [
+            enc
             for enc in self.encounters
-        )
+            if enc.type_code == self.rules.wellness_visit_code
+            and self._days_ago(enc.start) < self.rules.wellness_window_days
+        ]
+        checks["wellness_visit"] = bool(wellness)
 
         checks["overall"] = all(checks.values())
-        return checks
+        sources = {
+            "vaccinations": vaccinations,
+            "screenings": screenings,
+            "wellness_visit": wellness,
+            "overall": vaccinations + screenings + wellness,
+        }
+        return checks, sources
 
     def _is_pregnant(self) -> bool:
         """Check current pregnancy status through observations."""
-        # LOINC 82810-3: Pregnancy status
-        return any(
-            obs.code.coding[0].code == "82810-3"
-            for obs in self.observations
-        )
+        return self.rules.observation_codes["pregnancy"] in self._observation_codes
 
     def _is_high_risk_pregnancy(self) -> bool:
         """Identify high-risk pregnancy conditions."""
-        high_risk_codes = {
-            "O09.90",  # Supervision of high risk pregnancy, unspecified
-            "O24.419",  # Pre-existing type 2 diabetes complicating pregnancy
-            "O30.90",  # Multiple gestation pregnancy, unspecified
-        }
-        return any(
-            condition.code.coding[0].code in high_risk_codes
-            for condition in self.conditions
-        )
+        return bool(self._find_conditions(self.rules.high_risk_pregnancy_codes))
 
     def _days_ago(self, date_str: str) -> int:
         """Calculate days elapsed since a given ISO date string."""
         if not date_str:
             return float("inf")  # Treat missing dates as ancient
-        return (datetime.now() - datetime.strptime(date_str, "%Y-%m-%d")).days
+        return (self.as_of - self._parse_date(date_str)).days
+
+    def _parse_date(self, date_str: str) -> datetime:
+        """Parse an ISO date string, memoized per instance."""
+        parsed = self._parsed_dates.get(date_str)
+        if parsed is None:
+            parsed = datetime.strptime(date_str, "%Y-%m-%d")
+            self._parsed_dates[date_str] = parsed
+        return parsed
 
-    def _get_required_vaccines(self) -> List[str]:
+    def _get_required_vaccines(self) -> Tuple[CareRule, ...]:
         """Determine vaccines required based on patient demographics."""
-        age = self._calculate_patient_age()
-        vaccines = []
-
-        # Universal recommendations
-        vaccines.append("140")  # Influenza, seasonal (LOINC 140-4)
-
-        # Age-based recommendations
-        if age >= 50:
-            vaccines.append("17")  # Zoster vaccine (LOINC 17-1)
-        if age >= 65:
-            vaccines.append("33")  # Pneumococcal (LOINC 33-1)
-
-        # Gender-specific
-        if self.patient.gender == "female" and age < 26:
-            vaccines.append("62")  # HPV (LOINC 62-7)
-
-        return vaccines
-
-    def _has_required_screenings(self, age: int, gender: str) -> bool:
-        """Verify completion of age/gender appropriate health screenings."""
-        screenings = []
-
-        # Blood pressure screening (LOINC 85354-9)
-        if age >= 18:
-            screenings.append(
-                any(
-                    self._days_ago(obs.effectiveDateTime) < 730
-                    for obs in self.observations
-                    if obs.code.coding[0].code == "85354-9"
-                )
-            )
+        return self.rules.vaccines_for(
+            self._calculate_patient_age(), self.patient.gender
+        )
 
-        # Cancer screenings
-        if gender == "female":
-            if age >= 21:  # Pap smear (LOINC 47527-7)
-                screenings.append(
-                    any(
-                        self._days_ago(dr.effectiveDateTime) < 1095
-                        for dr in self.diagnostic_reports
-                        if dr.code.coding[0].code == "47527-7"
-                    )
-                )
-            if age >= 40:  # Mammogram (LOINC 24604-1)
-                screenings.append(
-                    any(
-                        self._days_ago(dr.effectiveDateTime) < 730
-                        for dr in self.diagnostic_reports
-                        if dr.code.coding[0].code == "24604-1"
-                    )
-                )
+    def _required_screenings(
+        self, age: int, gender: str
+    ) -> Tuple[bool, List[FhirRecord]]:
+        """
+        Verify completion of age/gender appropriate health screenings.
 
-        # Colon cancer screening
-        if age >= 45:
-            screenings.append(
-                any(
-                    # Colonoscopy/Stool DNA
-                    dr.code.coding[0].code in {"47519-4", "74211-9"}
-                    and self._days_ago(dr.effectiveDateTime) < 1825
-                    for dr in self.diagnostic_reports
+        Returns:
+            Tuple[bool, List[FhirRecord]]: Whether every screening is done,
+                and the observations or reports documenting the done ones.
+        """
+        documented: List[FhirRecord] = []
+        for screening in self.rules.screenings_for(age, gender):
+            if screening.source == "observation":
+                observation = self._latest_observation_within(
+                    screening.codes, screening.window_days
                 )
-            )
-
-        return all(screenings)
+                records = [observation] if observation is not None else []
+            else:
+                records = [
+                    report
+                    for report in self._find_reports(*screening.codes)
+                    if self._days_ago(report.effective) < screening.window_days
+                ]
+            if not records:
+                return False, documented
+            documented.extend(records)
+        return True, documented
 
     def _has_active_cancer_treatment(self) -> bool:
         """Identify active cancer therapies."""
-        treatment_codes = {
-            "Z51.11",  # Chemotherapy session
-            "36656000",  # Chemotherapy (SNOMED)
-            "1217123003",  # Radiation therapy
-        }
         return any(
-            proc.code.coding[0].code in treatment_codes
-            and self._days_ago(proc.performedDateTime) < 180
-            for proc in self.procedures
+            self._days_ago(proc.performed) < self.rules.recent_window_days
+            for proc in self._find_procedures(self.rules.cancer_treatment_codes)
         )
 
     def _in_experimental_treatment(self) -> bool:
         """Detect participation in experimental therapies."""
-        # Z00.6: Encounter for examination for normal comparison
-        # in clinical research program
-        return any(
-            proc.code.coding[0].code == "Z00.6" for proc in self.procedures
+        return bool(
+            self._find_procedures(self.rules.experimental_procedure_codes)
         ) or any(
-            "experimental" in med.medicationCodeableConcept.text.lower()
+            term in (med.name or "").lower()
             for med in self.medications
+            for term in self.rules.experimental_medication_terms
+        )
+
+
+# Eligibility checks in evaluation order, with the inputs each one reads
+_ELIGIBILITY_CHECKS: Tuple[Tuple[str, Callable, FrozenSet[str]], ...] = (
+    ("age", InsuranceCalculator._check_age, frozenset({"patient"})),
+    (
+        "terminal_conditions",
+        InsuranceCalculator._check_terminal_conditions,
+        frozenset({"conditions"}),
+    ),
+    (
+        "recent_surgery",
+        InsuranceCalculator._check_recent_surgery,
+        frozenset({"procedures"}),
+    ),
+    (
+        "unmanaged_chronic",
+        InsuranceCalculator._check_unmanaged_chronic,
+        _MANAGEMENT_INPUTS,
+    ),
+    (
+        "high_risk_pregnancy",
+        InsuranceCalculator._check_high_risk_pregnancy,
+        frozenset({"observations", "conditions"}),
+    ),
+    (
+        "recent_heart_attack",
+        InsuranceCalculator._check_recent_heart_attack,
+        frozenset({"conditions"}),
+    ),
+    (
+        "end_stage_renal",
+        InsuranceCalculator._check_end_stage_renal,
+        frozenset({"conditions"}),
+    ),
+    (
+        "cancer_treatment",
+        InsuranceCalculator._check_cancer_treatment,
+        frozenset({"procedures"}),
+    ),
+    (
+        "mental_health",
+        InsuranceCalculator._check_mental_health,
+        frozenset({"conditions"}),
+    ),
+    (
+        "substance_abuse",
+        InsuranceCalculator._check_substance_abuse,
+        frozenset({"conditions"}),
+    ),
+    (
+        "recent_transplant",
+        InsuranceCalculator._check_recent_transplant,
+        frozenset({"procedures"}),
+    ),
+    (
+        "experimental_treatment",
+        InsuranceCalculator._check_experimental_treatment,
+        frozenset({"procedures", "medications"}),
+    ),
+)
+_CHECKS_BY_NAME = {name: check for name, check, _ in _ELIGIBILITY_CHECKS}
+
+# Fail-fast order: cheapest expected cost per disqualifier first, measured
+# with RuleMetrics on the synthetic benchmark population
+FAST_ELIGIBILITY_ORDER: Tuple[str, ...] = (
+    "mental_health",
+    "end_stage_renal",
+    "unmanaged_chronic",
+    "experimental_treatment",
+    "terminal_conditions",
+    "substance_abuse",
+    "recent_surgery",
+    "recent_transplant",
+    "age",
+    "cancer_treatment",
+    "recent_heart_attack",
+    "high_risk_pregnancy",
+)
+
+
+def eligibility_order(metrics: RuleMetrics) -> Tuple[str, ...]:
+    """
+    Order eligibility checks for ``is_eligible`` from measured metrics.
+
+    Checks are ranked by mean cost divided by hit rate, i.e. the expected
+    time spent per disqualifier found. Checks that never fired, or were
+    never measured, run last in their default order.
+
+    Args:
+        metrics (RuleMetrics): Collector filled by instrumented calculators.
+
+    Returns:
+        Tuple[str, ...]: Every check name, in fail-fast order.
+    """
+
+    def expected_cost(indexed_name: Tuple[int, str]) -> Tuple[int, float]:
+        index, name = indexed_name
+        stats = metrics.rules.get(("eligibility", name))
+        if stats is None or not stats.hits:
+            return (1, index)
+        return (0, stats.seconds / stats.hits)
+
+    ranked = sorted(enumerate(_CHECKS_BY_NAME), key=expected_cost)
+    return tuple(name for _, name in ranked)
+
+# Premium facts: how each one is computed and the inputs it reads. Every
+# function returns the fact value and the records it was derived from; the
+# calculator's ``_<fact>_fact`` helpers follow the same (value, records) shape.
+_PREMIUM_FACTS: Dict[str, Tuple[Callable, FrozenSet[str]]] = {
+    "age": (
+        lambda calc: (calc._calculate_patient_age(), [calc.patient]),
+        frozenset({"patient"}),
+    ),
+    "bmi": (lambda calc: calc._bmi_fact(), frozenset({"observations"})),
+    "chronic_count": (
+        lambda calc: _counted(
+            calc._find_conditions(status="active", category="chronic")
+        ),
+        frozenset({"conditions"}),
+    ),
+    "smoker": (lambda calc: calc._smoker_fact(), frozenset({"observations"})),
+    "drinker": (
+        lambda calc: calc._drinker_fact(),
+        frozenset({"observations", "conditions"}),
+    ),
+    "ldl": (
+        lambda calc: _observed_value(
+            calc._latest_observation(calc.rules.observation_codes["ldl"])
+        ),
+        frozenset({"observations"}),
+    ),
+    "family_history_heart_disease": (
+        lambda calc: calc._family_history_heart_disease_fact(),
+        frozenset({"conditions"}),
+    ),
+    "er_visits": (
+        lambda calc: calc._er_visits_fact(),
+        frozenset({"encounters"}),
+    ),
+    "high_risk_occupation": (
+        lambda calc: calc._high_risk_occupation_fact(),
+        frozenset({"observations"}),
+    ),
+    "high_pollution_area": (
+        lambda calc: calc._high_pollution_area_fact(),
+        frozenset({"patient"}),
+    ),
+    "poor_medication_adherence": (
+        lambda calc: calc._poor_medication_adherence_fact(),
+        _MANAGEMENT_INPUTS,
+    ),
+    "high_risk_medications": (
+        lambda calc: calc._high_risk_medications_fact(),
+        frozenset({"medications"}),
+    ),
+    "vaccinations_complete": (
+        lambda calc: _preventive_check(calc, "vaccinations"),
+        frozenset({"patient", "immunizations"}),
+    ),
+    "preventive_care_complete": (
+        lambda calc: _preventive_check(calc, "overall"),
+        _PREVENTIVE_INPUTS,
+    ),
+}
+
+
+def _counted(records: List[FhirRecord]) -> Tuple[int, List[FhirRecord]]:
+    """A count fact and the records counted."""
+    return len(records), records
+
+
+def _observed_value(
+    observation: Optional[ObservationRecord],
+) -> Tuple[Optional[float], List[ObservationRecord]]:
+    """A numeric observation fact and the observation it came from."""
+    if observation is None:
+        return None, []
+    return observation.value, [observation]
+
+
+def _preventive_check(
+    calc: InsuranceCalculator, check: str
+) -> Tuple[bool, List[FhirRecord]]:
+    """One preventive-care check and the records that satisfied it."""
+    checks, sources = calc._preventive_care()
+    return bool(checks.get(check)), sources[check]
+
+
+# Scenario inputs that are not premium facts themselves
+_SCENARIO_INPUTS: FrozenSet[str] = frozenset({"height", "weight"})
+
+
+def _scenario_preventive_care(
+    calc: InsuranceCalculator, facts: Dict[str, object], overrides: Mapping
+) -> bool:
+    """Preventive care with the scenario's vaccination status."""
+    checks = calc._has_preventive_care()
+    return bool(
+        facts["vaccinations_complete"]
+        and checks["screenings"]
+        and checks["wellness_visit"]
+    )
+
+
+def _scenario_bmi(
+    calc: InsuranceCalculator, facts: Dict[str, object], overrides: Mapping
+) -> Optional[float]:
+    """BMI with the scenario's height and weight."""
+    measured = {}
+    for key in ("height", "weight"):
+        if key not in overrides:
+            observation = calc._latest_observation(calc.rules.observation_codes[key])
+            measured[key] = observation.value if observation is not None else None
+    height = overrides.get("height", measured.get("height"))
+    weight = overrides.get("weight", measured.get("weight"))
+    return weight / ((height / 100) ** 2) if height and weight else None
+
+
+# Facts recomputed in a scenario when something they derive from is
+# overridden: (overrides they depend on, derive function)
+_SCENARIO_DERIVED: Dict[str, Tuple[FrozenSet[str], Callable]] = {
+    "preventive_care_complete": (
+        frozenset({"vaccinations_complete"}),
+        _scenario_preventive_care,
+    ),
+    "bmi": (_SCENARIO_INPUTS, _scenario_bmi),
+}
+
+
+def _reference(record: FhirRecord) -> str:
+    """FHIR reference ("ResourceType/id") of a record."""
+    return f"{record.resource.get('resourceType')}/{record.id}"
+
+
+def _references(records: Iterable[FhirRecord]) -> List[str]:
+    return [_reference(record) for record in records]
+
+
+def _product(factors: Iterable[PremiumFactor]) -> float:
+    """Product of the multipliers of ``factors``, in order."""
+    multiplier = 1.0
+    for factor in factors:
+        multiplier *= factor.multiplier
+    return multiplier
+
+
+@dataclass
+class PremiumAdjustment:
+    """
+    One multiplier applied to a premium.
+
+    Attributes:
+        factor (str): Name of the premium factor.
+        fact (str): Name of the patient fact the factor tests.
+        value (object): Value of the fact for this patient.
+        condition (str): The comparison that held, e.g. "bmi > 30".
+        multiplier (float): Risk multiplier applied.
+        source_ids (List[str]): FHIR references ("ResourceType/id") of the
+            resources the fact was derived from.
+    """
+
+    factor: str
+    fact: str
+    value: object
+    condition: str
+    multiplier: float
+    source_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class PremiumTrace:
+    """
+    Explanation of a premium, as returned by ``calculate_premium(trace=True)``.
+
+    Attributes:
+        base_premium (float): Base monthly premium priced against.
+        multiplier (float): Product of every adjustment's multiplier.
+        premium (float): Resulting monthly premium.
+        adjustments (List[PremiumAdjustment]): Applied multipliers, in
+            rule-set order.
+    """
+
+    base_premium: float
+    multiplier: float
+    premium: float
+    adjustments: List[PremiumAdjustment] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, object]:
+        """Trace as plain data for a JSON response or audit log."""
+        return asdict(self)
+
+
+@dataclass
+class EvaluationDelta:
+    """
+    Change in a patient's evaluation after new resources were added.
+
+    Attributes:
+        eligible_before (bool): Eligibility before the update.
+        eligible_after (bool): Eligibility after the update.
+        premium_before (Optional[float]): Premium before, None if ineligible.
+        premium_after (Optional[float]): Premium after, None if ineligible.
+        reasons_added (List[str]): Disqualifying reasons that appeared.
+        reasons_removed (List[str]): Disqualifying reasons that went away.
+        changed_facts (Dict[str, Tuple[object, object]]): Premium facts whose
+            value changed, as (before, after).
+        recomputed (List[str]): Names of the checks and facts re-evaluated.
+    """
+
+    eligible_before: bool
+    eligible_after: bool
+    premium_before: Optional[float]
+    premium_after: Optional[float]
+    reasons_added: List[str] = field(default_factory=list)
+    reasons_removed: List[str] = field(default_factory=list)
+    changed_facts: Dict[str, Tuple[object, object]] = field(default_factory=dict)
+    recomputed: List[str] = field(default_factory=list)
+
+    @property
+    def premium_change(self) -> Optional[float]:
+        """Premium difference, None unless eligible both before and after."""
+        if self.premium_before is None or self.premium_after is None:
+            return None
+        return round(self.premium_after - self.premium_before, 2)
+
+
+def _positions_for(index: Dict[str, List[int]], keys: Iterable[str]) -> List[int]:
+    """Collect the sorted positions filed under any of ``keys``."""
+    positions = set()
+    for key in keys:
+        positions.update(index.get(key, ()))
+    return sorted(positions)
+
+
+# Batch evaluation --------------------------------------------------------------
+@dataclass
+class BatchResult:
+    """
+    Columnar result of evaluating many FHIR bundles.
+
+    Row ``i`` of every column belongs to the ``i``-th input bundle.
+
+    Attributes:
+        patient_ids (List[Optional[str]]): Patient resource id per bundle.
+        eligible (List[bool]): Eligibility decision per bundle.
+        reasons (List[List[str]]): Disqualifying reasons per bundle.
+        premiums (List[Optional[float]]): Monthly premium, None when ineligible.
+        errors (List[Optional[str]]): Why a bundle could not be evaluated,
+            None when it was; failed bundles are reported as ineligible.
+        elapsed_seconds (float): Wall time spent evaluating the batch.
+    """
+
+    patient_ids: List[Optional[str]] = field(default_factory=list)
+    eligible: List[bool] = field(default_factory=list)
+    reasons: List[List[str]] = field(default_factory=list)
+    premiums: List[Optional[float]] = field(default_factory=list)
+    errors: List[Optional[str]] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    def __len__(self) -> int:
+        return len(self.patient_ids)
+
+    def append(
+        self,
+        patient_id: Optional[str],
+        eligible: bool,
+        reasons: List[str],
+        premium: Optional[float],
+        error: Optional[str] = None,
+    ) -> None:
+        """Append one patient's evaluation as a new row."""
+        self.patient_ids.append(patient_id)
+        self.eligible.append(eligible)
+        self.reasons.append(reasons)
+        self.premiums.append(premium)
+        self.errors.append(error)
+
+    @property
+    def failed(self) -> int:
+        """Number of bundles that could not be evaluated."""
+        return sum(error is not None for error in self.errors)
+
+    @property
+    def bundles_per_second(self) -> float:
+        """Throughput of the batch run."""
+        if not self.elapsed_seconds:
+            return 0.0
+        return len(self) / self.elapsed_seconds
+
+
+def _evaluate_bundle(
+    bundle: Dict,
+    as_of: Optional[datetime] = None,
+    rules: Optional[RuleSet] = None,
+) -> Tuple[Optional[str], bool, List[str], Optional[float]]:
+    """Evaluate one bundle; the premium reuses the cached eligibility checks."""
+    calculator = InsuranceCalculator(bundle, as_of=as_of, rules=rules)
+    eligible, reasons = calculator.check_eligibility()
+    premium = calculator.calculate_premium() if eligible else None
+    patient_id = calculator.patient.id if calculator.patient else None
+    return patient_id, eligible, reasons, premium
+
+
+def _evaluate_row(
+    bundle: Dict,
+    as_of: Optional[datetime] = None,
+    rules: Optional[RuleSet] = None,
+) -> Tuple[Optional[str], bool, List[str], Optional[float], Optional[str]]:
+    """
+    ``_evaluate_bundle`` as a batch row; a bundle that fails to evaluate
+    becomes an ineligible row carrying the error instead of aborting the run.
+    """
+    try:
+        return (*_evaluate_bundle(bundle, as_of=as_of, rules=rules), None)
+    except Exception as e:
+        patient_id = next(
+            (
+                entry.get("resource", {}).get("id")
+                for entry in bundle.get("entry", ())
+                if entry.get("resource", {}).get("resourceType") == "Patient"
+            ),
+            None,
         )
+        error = f"{type(e).__name__}: {e}"
+        return patient_id, False, [f"Evaluation error: {error}"], None, error
+
+
+def evaluate_batch(
+    bundles: Iterable[Dict],
+    max_workers: Optional[int] = None,
+    chunksize: int = 64,
+    as_of: Optional[datetime] = None,
+    rules: Optional[RuleSet] = None,
+) -> BatchResult:
+    """
+    Evaluate eligibility and premium for many FHIR bundles.
+
+    Bundles are fanned out across a process pool in chunks to amortise the
+    inter-process overhead. Only a few chunks per worker are in flight at a
+    time, so ``bundles`` may be a lazy stream larger than memory. A bundle
+    that fails to evaluate is reported in ``BatchResult.errors`` and does not
+    abort the run.
+
+    Args:
+        bundles (Iterable[Dict]): FHIR Bundle resources, one per patient.
+        max_workers (Optional[int]): Number of worker processes. Defaults to
+            the CPU count; 1 evaluates in the calling process.
+        chunksize (int): Number of bundles sent to a worker at a time.
+        as_of (Optional[datetime]): Evaluation timestamp shared by every
+            bundle in the run. Defaults to the time the batch starts.
+        rules (Optional[RuleSet]): Compiled rule set. Defaults to the bundled
+            rule set. Workers share it through ``worker_pool``.
+
+    Returns:
+        BatchResult: Columnar eligibility, reasons and premium per patient.
+    """
+    result = BatchResult()
+    as_of = as_of or datetime.now()
+    start = time.perf_counter()
+    if max_workers == 1:
+        evaluate = partial(_evaluate_row, as_of=as_of, rules=rules)
+        for row in map(evaluate, bundles):
+            result.append(*row)
+    else:
+        # Tasks carry no rule set; workers use the one installed at startup
+        evaluate = partial(_evaluate_row, as_of=as_of)
+        with worker_pool(max_workers, rules) as executor:
+            rows = _bounded_map(
+                executor,
+                evaluate,
+                bundles,
+                chunksize=chunksize,
+                max_in_flight=2 * (max_workers or os.cpu_count() or 1),
+            )
+            for row in rows:
+                result.append(*row)
+    result.elapsed_seconds = time.perf_counter() - start
+    return result
+
+
+# Rule set installed in each batch worker process by ``worker_pool``
+_worker_rules: Optional[RuleSet] = None
+
+
+def _install_rules(rules: RuleSet) -> None:
+    """Worker initializer: make ``rules`` the process default."""
+    global _worker_rules
+    # Move everything inherited from the parent into the permanent
+    # generation, so the collector never writes to those pages. Only the
+    # worker is frozen; the caller's heap is left to the normal collector.
+    gc.freeze()
+    _worker_rules = rules
+
+
+def worker_pool(
+    max_workers: Optional[int] = None, rules: Optional[RuleSet] = None
+) -> ProcessPoolExecutor:
+    """
+    Process pool whose workers share one read-only rule set.
+
+    The rule set is handed to each worker once, by the pool initializer,
+    instead of being pickled into every task. With the ``fork`` start method
+    (the Linux default) workers inherit the parent's compiled rule set
+    copy-on-write. Each worker calls ``gc.freeze()`` on start-up, so its
+    collector never writes to those inherited objects and their pages stay
+    shared.
+    Other start methods pickle the rule set once per worker.
+
+    Args:
+        max_workers (Optional[int]): Worker processes. Defaults to every CPU.
+        rules (Optional[RuleSet]): Rule set to share. Defaults to the
+            bundled rule set.
+
+    Returns:
+        ProcessPoolExecutor: The pool; use it as a context manager.
+    """
+    rules = rules or load_rules()
+    return ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_install_rules, initargs=(rules,)
+    )
+
+
+def _map_chunk(function: Callable, chunk: List) -> List:
+    """Apply ``function`` to every item of a chunk inside a worker."""
+    return [function(item) for item in chunk]
+
+
+def _bounded_map(
+    executor: Executor,
+    function: Callable,
+    items: Iterable,
+    chunksize: int,
+    max_in_flight: int,
+) -> Iterator:
+    """
+    Ordered ``executor.map`` that keeps at most ``max_in_flight`` chunks queued.
+
+    Unlike ``Executor.map``, the input iterable is consumed incrementally.
+    """
+    iterator = iter(items)
+    pending = deque()
+    while True:
+        chunk = list(islice(iterator, chunksize))
+        if not chunk:
+            break
+        pending.append(executor.submit(_map_chunk, function, chunk))
+        if len(pending) >= max_in_flight:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
@@ -0,0 +1,253 @@
+"""
+Insurance Fact Export:
+Stream per-patient risk facts into a typed columnar file.
+
+Analytics needs the intermediate facts behind a premium, not just the premium:
+age, BMI, lifestyle flags, chronic count, the preventive-care breakdown and
+every disqualifying reason. Batch runs write these to Parquet or an Arrow IPC
+file, one row group at a time, so memory is bounded by the row-group size
+rather than the number of members. Reasons are dictionary-encoded against a
+vocabulary shared by the whole file.
+
+Usage:
+    from insurance_export import write_risk_facts
+    write_risk_facts(stream_patient_bundles("export/"), "facts.parquet")
+
+Dependencies:
+    - pyarrow
+    - insurance_calculator_refactored
+"""
+
+import os
+from datetime import datetime
+from functools import partial
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from insurance_calculator_refactored import (
+    InsuranceCalculator,
+    _bounded_map,
+    worker_pool,
+)
+from insurance_rules import RuleSet
+
+# Exported columns and their Arrow types, in file order. "reasons" is a list
+# of dictionary-encoded strings and is built separately.
+RISK_FACT_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("patient_id", "string"),
+    ("eligible", "bool"),
+    ("premium", "float64"),
+    ("age", "int16"),
+    ("bmi", "float64"),
+    ("chronic_count", "int16"),
+    ("smoker", "bool"),
+    ("drinker", "bool"),
+    ("ldl", "float64"),
+    ("family_history_heart_disease", "bool"),
+    ("er_visits", "int16"),
+    ("high_risk_occupation", "bool"),
+    ("high_pollution_area", "bool"),
+    ("poor_medication_adherence", "bool"),
+    ("high_risk_medications", "bool"),
+    ("vaccinations_complete", "bool"),
+    ("screenings_complete", "bool"),
+    ("wellness_visit", "bool"),
+    ("preventive_care_complete", "bool"),
+)
+
+DEFAULT_ROW_GROUP_SIZE = 64 * 1024
+
+
+def risk_facts(calculator: InsuranceCalculator) -> Tuple[Tuple, List[str]]:
+    """
+    Collect the exported facts of one evaluated patient.
+
+    Args:
+        calculator (InsuranceCalculator): Calculator for the patient.
+
+    Returns:
+        Tuple[Tuple, List[str]]: Values in ``RISK_FACT_COLUMNS`` order, and
+            the disqualifying reasons.
+    """
+    eligible, reasons = calculator.check_eligibility()
+    facts = calculator._premium_facts()
+    preventive = calculator._has_preventive_care()
+    values = {
+        "patient_id": calculator.patient.id if calculator.patient else None,
+        "eligible": eligible,
+        "premium": calculator.calculate_premium() if eligible else None,
+        "screenings_complete": preventive["screenings"],
+        "wellness_visit": preventive["wellness_visit"],
+    }
+    row = tuple(
+        values[name] if name in values else facts[name]
+        for name, _ in RISK_FACT_COLUMNS
+    )
+    return row, list(reasons)
+
+
+def _extract_risk_facts(
+    bundle: Dict,
+    as_of: Optional[datetime] = None,
+    rules: Optional[RuleSet] = None,
+) -> Tuple[Tuple, List[str]]:
+    """Parse one bundle and collect its exported facts."""
+    return risk_facts(InsuranceCalculator(bundle, as_of=as_of, rules=rules))
+
+
+def iter_risk_facts(
+    bundles: Iterable[Dict],
+    max_workers: Optional[int] = 1,
+    chunksize: int = 64,
+    as_of: Optional[datetime] = None,
+    rules: Optional[RuleSet] = None,
+) -> Iterator[Tuple[Tuple, List[str]]]:
+    """
+    Lazily evaluate bundles into exported fact rows, in input order.
+
+    Args:
+        bundles (Iterable[Dict]): FHIR Bundle resources, one per patient.
+        max_workers (Optional[int]): Worker processes; 1 evaluates in the
+            calling process, None uses every CPU.
+        chunksize (int): Number of bundles sent to a worker at a time.
+        as_of (Optional[datetime]): Evaluation timestamp shared by all rows.
+        rules (Optional[RuleSet]): Compiled rule set.
+
+    Yields:
+        Tuple[Tuple, List[str]]: Fact values and reasons per patient.
+    """
+    as_of = as_of or datetime.now()
+    if max_workers == 1:
+        yield from map(partial(_extract_risk_facts, as_of=as_of, rules=rules), bundles)
+        return
+    # Workers share the rule set installed by worker_pool
+    extract = partial(_extract_risk_facts, as_of=as_of)
+    with worker_pool(max_workers, rules) as executor:
+        yield from _bounded_map(
+            executor,
+            extract,
+            bundles,
+            chunksize=chunksize,
+            max_in_flight=2 * (max_workers or os.cpu_count() or 1),
+        )
+
+
+def risk_fact_schema():
+    """Arrow schema of the exported file."""
+    import pyarrow as pa
+
+    fields = [
+        pa.field(name, pa.type_for_alias(type_name))
+        for name, type_name in RISK_FACT_COLUMNS
+    ]
+    reason_type = pa.dictionary(pa.int32(), pa.string())
+    fields.append(pa.field("reasons", pa.list_(reason_type)))
+    return pa.schema(fields)
+
+
+class _ReasonVocabulary:
+    """Append-only reason dictionary shared by every row group of a file."""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def encode(self, reasons: List[str]) -> List[int]:
+        indices = []
+        for reason in reasons:
+            code = self.codes.get(reason)
+            if code is None:
+                code = self.codes[reason] = len(self.values)
+                self.values.append(reason)
+            indices.append(code)
+        return indices
+
+
+def _record_batch(
+    schema, rows: List[Tuple[Tuple, List[str]]], vocabulary: _ReasonVocabulary
+):
+    """Build one row group from buffered rows."""
+    import pyarrow as pa
+
+    columns = [
+        pa.array([row[i] for row, _ in rows], type=schema.field(i).type)
+        for i in range(len(RISK_FACT_COLUMNS))
+    ]
+    offsets = [0]
+    indices: List[int] = []
+    for _, reasons in rows:
+        indices.extend(vocabulary.encode(reasons))
+        offsets.append(len(indices))
+    # The dictionary only grows, so later batches extend earlier ones
+    # and can be written as dictionary deltas
+    reasons = pa.DictionaryArray.from_arrays(
+        pa.array(indices, type=pa.int32()),
+        pa.array(vocabulary.values, type=pa.string()),
+    )
+    columns.append(
+        pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), reasons)
+    )
+    return pa.record_batch(columns, schema=schema)
+
+
+def write_risk_facts(
+    bundles: Iterable[Dict],
+    path: str,
+    file_format: Optional[str] = None,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    compression: str = "zstd",
+    **batch_options,
+) -> int:
+    """
+    Evaluate bundles and stream their risk facts into a columnar file.
+
+    Args:
+        bundles (Iterable[Dict]): FHIR Bundle resources, consumed lazily.
+        path (str): Output file path.
+        file_format (Optional[str]): "parquet" or "arrow" (Arrow IPC file).
+            Defaults to "arrow" for ``.arrow``/``.feather``/``.ipc`` paths,
+            otherwise "parquet".
+        row_group_size (int): Patients buffered per row group / record batch.
+        compression (str): Parquet codec, or IPC buffer codec ("zstd" or
+            "lz4"; "none" disables compression).
+        **batch_options: Passed to ``iter_risk_facts`` (``max_workers``,
+            ``chunksize``, ``as_of``, ``rules``).
+
+    Returns:
+        int: Number of patients written.
+
+    Raises:
+        ValueError: If ``file_format`` is unknown.
+    """
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+
+    if file_format is None:
+        extension = os.path.splitext(path)[1].lower()
+        is_ipc = extension in (".arrow", ".feather", ".ipc")
+        file_format = "arrow" if is_ipc else "parquet"
+    codec = None if compression == "none" else compression
+    schema = risk_fact_schema()
+    if file_format == "parquet":
+        writer = pq.ParquetWriter(path, schema, compression=codec or "none")
+    elif file_format == "arrow":
+        options = ipc.IpcWriteOptions(compression=codec, emit_dictionary_deltas=True)
+        writer = ipc.new_file(path, schema, options=options)
+    else:
+        raise ValueError(
+            f"Unknown file format {file_format!r}; use 'parquet' or 'arrow'"
+        )
+
+    vocabulary = _ReasonVocabulary()
+    written = 0
+    buffer: List[Tuple[Tuple, List[str]]] = []
+    with writer:
+        for row in iter_risk_facts(bundles, **batch_options):
+            buffer.append(row)
+            if len(buffer) >= row_group_size:
+                writer.write_batch(_record_batch(schema, buffer, vocabulary))
+                written += len(buffer)
+                buffer = []
+        if buffer:
+            writer.write_batch(_record_batch(schema, buffer, vocabulary))
+            written += len(buffer)
+    return written
@@ -0,0 +1,229 @@
+"""
+Insurance Rule Metrics:
+Per-rule timing and hit counts for the insurance calculator.
+
+Pass a ``RuleMetrics`` to ``InsuranceCalculator(..., metrics=...)`` to record,
+for every eligibility check, premium fact and premium factor, how often it ran,
+how often it fired and how much wall time it took. Without a metrics object
+the calculator skips all timing, so instrumentation costs nothing when off.
+
+Metrics live in the process that evaluated the rules. For process-pool
+batches, collect a ``RuleMetrics`` per worker and combine them with
+``merge``.
+
+``LatencyHistogram`` provides fixed-bucket latency histograms for services
+built on the calculator.
+
+Dependencies:
+    - json
+    - dataclasses
+"""
+
+import json
+from bisect import bisect_left
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Tuple
+
+# Default latency buckets in seconds, from 1ms to 10s
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+@dataclass
+class RuleStats:
+    """
+    Counters for one rule.
+
+    Attributes:
+        invocations (int): Number of times the rule was evaluated.
+        hits (int): Number of evaluations where the rule fired (a check found
+            a disqualifier, a fact was truthy, a factor applied).
+        seconds (float): Total wall time spent evaluating the rule.
+    """
+
+    invocations: int = 0
+    hits: int = 0
+    seconds: float = 0.0
+
+
+class RuleMetrics:
+    """
+    Collects ``RuleStats`` keyed by rule kind and rule name.
+
+    Kinds used by the calculator are "eligibility", "premium_fact" and
+    "premium_factor".
+    """
+
+    def __init__(self):
+        self.rules: Dict[Tuple[str, str], RuleStats] = {}
+
+    def record(self, kind: str, name: str, seconds: float, hit: bool) -> None:
+        """
+        Record one evaluation of a rule.
+
+        Args:
+            kind (str): Rule kind, e.g. "eligibility".
+            name (str): Rule name within its kind.
+            seconds (float): Wall time of the evaluation.
+            hit (bool): Whether the rule fired.
+        """
+        stats = self.rules.get((kind, name))
+        if stats is None:
+            stats = self.rules[(kind, name)] = RuleStats()
+        stats.invocations += 1
+        stats.hits += bool(hit)
+        stats.seconds += seconds
+
+    def merge(self, other: "RuleMetrics") -> None:
+        """Add the counters of another collector, e.g. from a worker process."""
+        for (kind, name), theirs in other.rules.items():
+            stats = self.rules.setdefault((kind, name), RuleStats())
+            stats.invocations += theirs.invocations
+            stats.hits += theirs.hits
+            stats.seconds += theirs.seconds
+
+    def reset(self) -> None:
+        """Drop every recorded counter."""
+        self.rules.clear()
+
+    def slowest(self, count: int = 10) -> List[Tuple[str, str, RuleStats]]:
+        """Rules sorted by total wall time, most expensive first."""
+        ranked = sorted(self.rules.items(), key=lambda item: -item[1].seconds)
+        return [(kind, name, stats) for (kind, name), stats in ranked[:count]]
+
+    def to_dict(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Counters as nested plain dicts.
+
+        Returns:
+            Dict[str, Dict[str, Dict[str, float]]]: Stats keyed by rule kind,
+                then rule name.
+        """
+        report: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for (kind, name), stats in sorted(self.rules.items()):
+            report.setdefault(kind, {})[name] = asdict(stats)
+        return report
+
+    def to_json(self, indent: int = 2) -> str:
+        """Counters as a JSON report."""
+        return json.dumps({"rules": self.to_dict()}, indent=indent)
+
+    def to_prometheus(self, prefix: str = "insurance_rule") -> str:
+        """
+        Counters in the Prometheus text exposition format.
+
+        Args:
+            prefix (str): Metric name prefix.
+
+        Returns:
+            str: ``<prefix>_invocations_total``, ``<prefix>_hits_total`` and
+                ``<prefix>_seconds_total`` counters labelled by kind and rule.
+        """
+        metrics = (
+            ("invocations", "Rule evaluations."),
+            ("hits", "Rule evaluations where the rule fired."),
+            ("seconds", "Wall time spent evaluating the rule."),
+        )
+        lines = []
+        for field_name, help_text in metrics:
+            metric = f"{prefix}_{field_name}_total"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for (kind, name), stats in sorted(self.rules.items()):
+                labels = f'kind="{_escape(kind)}",rule="{_escape(name)}"'
+                lines.append(f"{metric}{{{labels}}} {getattr(stats, field_name)}")
+        return "\n".join(lines) + "\n"
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram in the Prometheus style.
+
+    Attributes:
+        buckets (Tuple[float, ...]): Upper bucket bounds in seconds, ascending.
+        counts (List[int]): Observations per bucket; the last entry counts
+            observations above every bound.
+        count (int): Total number of observations.
+        sum (float): Total of all observed values, in seconds.
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Record one latency."""
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the ``q`` quantile.
+
+        Args:
+            q (float): Quantile between 0 and 1.
+
+        Returns:
+            float: Bucket bound in seconds; ``inf`` if the quantile lies above
+                every bucket, 0.0 if nothing was observed.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self) -> Dict[str, object]:
+        """Histogram as plain data for a JSON report."""
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "count": self.count,
+            "sum": self.sum,
+        }
+
+    def to_prometheus(self, name: str, help_text: str) -> str:
+        """
+        Histogram in the Prometheus text exposition format.
+
+        Args:
+            name (str): Metric name, e.g. "quote_latency_seconds".
+            help_text (str): HELP line text.
+
+        Returns:
+            str: Cumulative ``_bucket`` series plus ``_sum`` and ``_count``.
+        """
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum {self.sum}")
+        lines.append(f"{name}_count {self.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,195 @@
+"""
+Insurance Records:
+Lightweight, validation-free views of the FHIR resources the insurance calculator reads.
+
+Building full ``fhir.resources`` pydantic models dominates CPU on large bundles,
+while the eligibility and premium rules only read a handful of fields. Each
+record copies those fields out of the raw resource dict into slots. The full
+model is built lazily, and only when a caller asks for ``record.model``.
+
+Dependencies:
+    - fhir.resources (only when ``record.model`` is accessed)
+    - typing
+"""
+
+import importlib
+from typing import Any, Dict, Optional, Tuple
+
+
+def _code(concept: Optional[Dict]) -> Optional[str]:
+    """Code of the first coding in a CodeableConcept dict."""
+    if not concept:
+        return None
+    coding = concept.get("coding")
+    return coding[0].get("code") if coding else None
+
+
+def _codes(concept: Optional[Dict]) -> Tuple[str, ...]:
+    """Codes of every coding in a CodeableConcept dict."""
+    if not concept:
+        return ()
+    return tuple(c.get("code") for c in concept.get("coding") or ())
+
+
+def _first(items: Optional[list]) -> Optional[Any]:
+    """First element of an optional FHIR list."""
+    return items[0] if items else None
+
+
+class FhirRecord:
+    """
+    Base class for lightweight FHIR resource records.
+
+    Attributes:
+        id (Optional[str]): Resource id.
+        resource (Dict): The raw resource dict the record was built from.
+    """
+
+    __slots__ = ("id", "resource", "_model")
+
+    # Dotted path of the fhir.resources model class for this resource type
+    model_path = ""
+
+    def __init__(self, resource: Dict):
+        self.id = resource.get("id")
+        self.resource = resource
+        self._model = None
+
+    @property
+    def model(self) -> Any:
+        """Full, validated ``fhir.resources`` model, built on first access."""
+        if self._model is None:
+            module_name, _, class_name = self.model_path.rpartition(".")
+            model_class = getattr(importlib.import_module(module_name), class_name)
+            self._model = model_class(**self.resource)
+        return self._model
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(id={self.id!r})"
+
+
+class PatientRecord(FhirRecord):
+    """Patient fields: birth date, gender and address postal codes."""
+
+    __slots__ = ("birth_date", "gender", "postal_codes")
+    model_path = "fhir.resources.patient.Patient"
+
+    def __init__(self, resource: Dict):
+        super().__init__(resource)
+        self.birth_date: Optional[str] = resource.get("birthDate")
+        self.gender: Optional[str] = resource.get("gender")
+        self.postal_codes: Tuple[Optional[str], ...] = tuple(
+            address.get("postalCode") for address in resource.get("address") or ()
+        )
+
+
+class ConditionRecord(FhirRecord):
+    """Condition fields: code, clinical status, categories and onset."""
+
+    __slots__ = ("code", "clinical_status", "categories", "onset")
+    model_path = "fhir.resources.condition.Condition"
+
+    def __init__(self, resource: Dict):
+        super().__init__(resource)
+        self.code: Optional[str] = _code(resource.get("code"))
+        self.clinical_status: Optional[str] = _code(resource.get("clinicalStatus"))
+        self.categories: Tuple[Optional[str], ...] = tuple(
+            _code(category) for category in resource.get("category") or ()
+        )
+        self.onset: Optional[str] = resource.get("onsetDateTime")
+
+
+class ObservationRecord(FhirRecord):
+    """Observation fields: code, quantity, text and string values, and date."""
+
+    __slots__ = ("code", "value", "value_text", "value_string", "effective")
+    model_path = "fhir.resources.observation.Observation"
+
+    def __init__(self, resource: Dict):
+        super().__init__(resource)
+        self.code: Optional[str] = _code(resource.get("code"))
+        quantity = (resource.get("valueQuantity") or {}).get("value")
+        self.value: Optional[float] = float(quantity) if quantity is not None else None
+        self.value_text: Optional[str] = (
+            resource.get("valueCodeableConcept") or {}
+        ).get("text")
+        self.value_string: Optional[str] = resource.get("valueString")
+        self.effective: Optional[str] = resource.get("effectiveDateTime")
+
+
+class ProcedureRecord(FhirRecord):
+    """Procedure fields: code and performed date."""
+
+    __slots__ = ("code", "performed")
+    model_path = "fhir.resources.procedure.Procedure"
+
+    def __init__(self, resource: Dict):
+        super().__init__(resource)
+        self.code: Optional[str] = _code(resource.get("code"))
+        self.performed: Optional[str] = resource.get("performedDateTime")
+
+
+class MedicationRecord(FhirRecord):
+    """MedicationRequest fields: status, authored date, reason codes and name."""
+
+    __slots__ = ("status", "authored_on", "reason_codes", "name")
+    model_path = "fhir.resources.medicationrequest.MedicationRequest"
+
+    def __init__(self, resource: Dict):
+        super().__init__(resource)
+        self.status: Optional[str] = resource.get("status")
+        self.authored_on: Optional[str] = resource.get("authoredOn")
+        self.reason_codes: Tuple[str, ...] = _codes(_first(resource.get("reasonCode")))
+        self.name: Optional[str] = (
+            resource.get("medicationCodeableConcept") or {}
+        ).get("text")
+
+
+class EncounterRecord(FhirRecord):
+    """Encounter fields: type code, start date and reason codes."""
+
+    __slots__ = ("type_code", "start", "reason_codes")
+    model_path = "fhir.resources.encounter.Encounter"
+
+    def __init__(self, resource: Dict):
+        super().__init__(resource)
+        self.type_code: Optional[str] = _code(_first(resource.get("type")))
+        self.start: Optional[str] = (resource.get("period") or {}).get("start")
+        self.reason_codes: Tuple[str, ...] = _codes(_first(resource.get("reasonCode")))
+
+
+class ImmunizationRecord(FhirRecord):
+    """Immunization fields: vaccine code and occurrence date."""
+
+    __slots__ = ("vaccine_code", "occurred")
+    model_path = "fhir.resources.immunization.Immunization"
+
+    def __init__(self, resource: Dict):
+        super().__init__(resource)
+        self.vaccine_code: Optional[str] = _code(resource.get("vaccineCode"))
+        self.occurred: Optional[str] = resource.get("occurrenceDateTime")
+
+
+class DiagnosticReportRecord(FhirRecord):
+    """DiagnosticReport fields: code and effective date."""
+
+    __slots__ = ("code", "effective")
+    model_path = "fhir.resources.diagnosticreport.DiagnosticReport"
+
+    def __init__(self, resource: Dict):
+        super().__init__(resource)
+        self.code: Optional[str] = _code(resource.get("code"))
+        self.effective: Optional[str] = resource.get("effectiveDateTime")
+
+
+# Record class for each supported FHIR resource type
+RECORD_TYPES = {
+    "Patient": PatientRecord,
+    "Condition": ConditionRecord,
+    "Observation": ObservationRecord,
+    "Procedure": ProcedureRecord,
+    "MedicationRequest": MedicationRecord,
+    "Encounter": EncounterRecord,
+    "Immunization": ImmunizationRecord,
+    "DiagnosticReport": DiagnosticReportRecord,
+}
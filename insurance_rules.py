@@ -0,0 +1,396 @@
+"""
+Insurance Rules:
+Declarative rule sets for the insurance calculator.
+
+Eligibility codes, look-back windows, preventive-care requirements and premium
+multipliers are kept in a JSON rule file so actuarial changes do not need a
+code deploy. A rule file is compiled once into frozen sets, prefix tables and
+comparison predicates that ``InsuranceCalculator`` evaluates directly.
+
+Dependencies:
+    - json
+    - dataclasses
+    - typing
+"""
+
+import hashlib
+import json
+import logging
+import operator
+import os
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "insurance_rules.json"
+)
+
+# Comparison operators usable in premium factors. They work element-wise on
+# NumPy arrays as well as on scalars, so factors can be vectorized.
+OPERATORS: Dict[str, Callable[[Any, Any], Any]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+}
+
+# Resource lists a screening can be documented in.
+SCREENING_SOURCES = {"observation", "diagnostic_report"}
+
+
+@dataclass(frozen=True)
+class PrefixTable:
+    """
+    ICD-10 code prefixes grouped by their 3-character category.
+
+    Lookups first narrow to the category, then test the (possibly longer)
+    prefixes filed under it, so matching is independent of table size.
+
+    Attributes:
+        categories (Dict[str, Tuple[str, ...]]): Prefixes keyed by category.
+    """
+
+    categories: Dict[str, Tuple[str, ...]]
+
+    @classmethod
+    def compile(cls, prefixes: Iterable[str]) -> "PrefixTable":
+        """Build a table from a list of ICD-10 prefixes."""
+        categories: Dict[str, list] = {}
+        for prefix in prefixes:
+            if len(prefix) < 3:
+                raise ValueError(
+                    f"ICD prefix must cover a 3-character category: {prefix!r}"
+                )
+            categories.setdefault(prefix[:3], []).append(prefix)
+        return cls({key: tuple(group) for key, group in categories.items()})
+
+    def matches(self, code: str) -> bool:
+        """Check whether a code starts with any prefix in the table."""
+        return any(code.startswith(p) for p in self.categories.get(code[:3], ()))
+
+
+@dataclass(frozen=True)
+class LabRequirement:
+    """
+    Lab monitoring expected for a managed chronic condition.
+
+    Attributes:
+        codes (FrozenSet[str]): LOINC codes that satisfy the requirement.
+        frequency (int): Maximum age of the latest result, in days.
+    """
+
+    codes: FrozenSet[str]
+    frequency: int
+
+
+@dataclass(frozen=True)
+class CareRule:
+    """
+    A preventive-care item required for part of the population.
+
+    Attributes:
+        codes (FrozenSet[str]): Codes that satisfy the item.
+        source (Optional[str]): Resource list a screening is documented in;
+            None for vaccines.
+        window_days (Optional[int]): Look-back window for screenings.
+        min_age (Optional[int]): Minimum age the item applies from.
+        below_age (Optional[int]): Age the item stops applying at.
+        gender (Optional[str]): Administrative gender the item applies to.
+    """
+
+    codes: FrozenSet[str]
+    source: Optional[str] = None
+    window_days: Optional[int] = None
+    min_age: Optional[int] = None
+    below_age: Optional[int] = None
+    gender: Optional[str] = None
+
+    def applies_to(self, age: int, gender: Optional[str]) -> bool:
+        """Check whether the item is required for a patient."""
+        if self.min_age is not None and age < self.min_age:
+            return False
+        if self.below_age is not None and age >= self.below_age:
+            return False
+        return self.gender is None or self.gender == gender
+
+
+@dataclass(frozen=True)
+class PremiumFactor:
+    """
+    A conditional premium multiplier.
+
+    The factor applies when ``fact <op> value`` holds. Factors sharing a
+    group are mutually exclusive: only the first matching one applies.
+
+    Attributes:
+        name (str): Identifier of the factor.
+        fact (str): Name of the patient fact the factor tests.
+        op (str): Comparison operator, one of ``OPERATORS``.
+        value (Any): Value the fact is compared with.
+        multiplier (float): Risk multiplier applied when the factor holds.
+        group (Optional[str]): Mutual-exclusion group, if any.
+    """
+
+    name: str
+    fact: str
+    op: str
+    value: Any
+    multiplier: float
+    group: Optional[str] = None
+
+    def compare(self, values: Any) -> Any:
+        """Apply the comparison to a scalar or an array of fact values."""
+        return OPERATORS[self.op](values, self.value)
+
+    def applies(self, facts: Mapping[str, Any]) -> bool:
+        """Check the factor against a mapping of facts; missing facts never match."""
+        value = facts.get(self.fact)
+        if value is None:
+            return False
+        return bool(self.compare(value))
+
+
+@dataclass(frozen=True, eq=False)
+class RuleSet:
+    """
+    A compiled rule set for eligibility and premium calculation.
+
+    Build one with ``RuleSet.from_dict`` or ``load_rules``; the field names
+    mirror the keys of the JSON rule file. A rule set is read-only once
+    built and is meant to be shared: by every calculator in a process, and
+    by forked batch workers (see ``worker_pool``). Rule sets compare and
+    hash by identity.
+    """
+
+    version: str
+    # SHA-256 of the canonical rule file contents; changes with any rule edit
+    digest: str
+    # Eligibility
+    max_age: int
+    recent_window_days: int
+    terminal_codes: FrozenSet[str]
+    recent_surgery_codes: FrozenSet[str]
+    transplant_codes: FrozenSet[str]
+    managed_chronic_codes: FrozenSet[str]
+    min_management_checks: int
+    high_risk_pregnancy_codes: FrozenSet[str]
+    heart_attack_prefixes: PrefixTable
+    end_stage_renal_codes: FrozenSet[str]
+    cancer_treatment_codes: FrozenSet[str]
+    mental_health_codes: FrozenSet[str]
+    substance_abuse_prefixes: PrefixTable
+    experimental_procedure_codes: FrozenSet[str]
+    experimental_medication_terms: Tuple[str, ...]
+    # Chronic condition management
+    provider_visit_window_days: int
+    medication_window_days: int
+    lab_requirements: Dict[str, LabRequirement]
+    # Observation LOINC codes by purpose
+    observation_codes: Dict[str, str]
+    # Lifestyle and environment
+    smoker_term: str
+    drinker_answers: FrozenSet[str]
+    alcohol_condition_codes: FrozenSet[str]
+    family_history_codes: FrozenSet[str]
+    risky_jobs: FrozenSet[str]
+    high_pollution_zips: FrozenSet[str]
+    high_risk_med_terms: Tuple[str, ...]
+    er_encounter_code: str
+    er_window_days: int
+    # Preventive care
+    vaccine_window_days: int
+    vaccines: Tuple[CareRule, ...]
+    screenings: Tuple[CareRule, ...]
+    wellness_visit_code: str
+    wellness_window_days: int
+    # Premium
+    base_premium: float
+    premium_factors: Tuple[PremiumFactor, ...]
+    # Care rule age boundaries, and the applicable care rules per
+    # (kind, age band, gender); built once, never written afterwards
+    _care_ages: Tuple[int, ...] = field(init=False, repr=False)
+    _care_table: Dict[Tuple[str, int, Optional[str]], Tuple[CareRule, ...]] = field(
+        init=False, repr=False
+    )
+
+    def __post_init__(self):
+        care_rules = self.vaccines + self.screenings
+        ages = sorted(
+            {rule.min_age for rule in care_rules if rule.min_age is not None}
+            | {rule.below_age for rule in care_rules if rule.below_age is not None}
+        )
+        genders = {rule.gender for rule in care_rules} | {None}
+        # Band 0 holds ages below every boundary; band i starts at ages[i - 1]
+        representatives = [ages[0] - 1 if ages else 0] + ages
+        table = {
+            (kind, band, gender): tuple(
+                rule for rule in rules if rule.applies_to(age, gender)
+            )
+            for kind, rules in (("vaccines", self.vaccines), ("screenings", self.screenings))
+            for band, age in enumerate(representatives)
+            for gender in genders
+        }
+        object.__setattr__(self, "_care_ages", tuple(ages))
+        object.__setattr__(self, "_care_table", table)
+
+    def vaccines_for(self, age: int, gender: Optional[str]) -> Tuple[CareRule, ...]:
+        """Vaccines required for a patient's age and gender."""
+        return self._applicable("vaccines", age, gender)
+
+    def screenings_for(
+        self, age: int, gender: Optional[str]
+    ) -> Tuple[CareRule, ...]:
+        """Screenings required for a patient's age and gender."""
+        return self._applicable("screenings", age, gender)
+
+    def _applicable(
+        self, kind: str, age: int, gender: Optional[str]
+    ) -> Tuple[CareRule, ...]:
+        band = bisect_right(self._care_ages, age)
+        applicable = self._care_table.get((kind, band, gender))
+        if applicable is None:
+            # A gender no care rule names gets only the gender-neutral rules
+            applicable = self._care_table[(kind, band, None)]
+        return applicable
+
+    @classmethod
+    def from_dict(cls, raw: Mapping[str, Any]) -> "RuleSet":
+        """
+        Compile a parsed rule file.
+
+        Args:
+            raw (Mapping[str, Any]): Rule file contents.
+
+        Returns:
+            RuleSet: The compiled rule set.
+
+        Raises:
+            ValueError: If a premium factor or care rule is malformed.
+        """
+        eligibility = raw["eligibility"]
+        management = raw["management"]
+        lifestyle = raw["lifestyle"]
+        preventive = raw["preventive_care"]
+        premium = raw["premium"]
+        for section in ("eligibility", "lifestyle"):
+            for key, value in raw[section].items():
+                if isinstance(value, list) and not value:
+                    logger.warning(
+                        f"Rule list {section}.{key} is empty; the rule it "
+                        f"feeds will never match"
+                    )
+        canonical = json.dumps(raw, sort_keys=True, separators=(",", ":"))
+        return cls(
+            version=str(raw["version"]),
+            digest=hashlib.sha256(canonical.encode("utf-8")).hexdigest(),
+            max_age=eligibility["max_age"],
+            recent_window_days=eligibility["recent_window_days"],
+            terminal_codes=frozenset(eligibility["terminal_codes"]),
+            recent_surgery_codes=frozenset(eligibility["recent_surgery_codes"]),
+            transplant_codes=frozenset(eligibility["transplant_codes"]),
+            managed_chronic_codes=frozenset(eligibility["managed_chronic_codes"]),
+            min_management_checks=eligibility["min_management_checks"],
+            high_risk_pregnancy_codes=frozenset(
+                eligibility["high_risk_pregnancy_codes"]
+            ),
+            heart_attack_prefixes=PrefixTable.compile(
+                eligibility["heart_attack_prefixes"]
+            ),
+            end_stage_renal_codes=frozenset(eligibility["end_stage_renal_codes"]),
+            cancer_treatment_codes=frozenset(eligibility["cancer_treatment_codes"]),
+            mental_health_codes=frozenset(eligibility["mental_health_codes"]),
+            substance_abuse_prefixes=PrefixTable.compile(
+                eligibility["substance_abuse_prefixes"]
+            ),
+            experimental_procedure_codes=frozenset(
+                eligibility["experimental_procedure_codes"]
+            ),
+            experimental_medication_terms=tuple(
+                eligibility["experimental_medication_terms"]
+            ),
+            provider_visit_window_days=management["provider_visit_window_days"],
+            medication_window_days=management["medication_window_days"],
+            lab_requirements={
+                code: LabRequirement(frozenset(req["codes"]), req["frequency"])
+                for code, req in management["lab_requirements"].items()
+            },
+            observation_codes=dict(raw["observations"]),
+            smoker_term=lifestyle["smoker_term"],
+            drinker_answers=frozenset(lifestyle["drinker_answers"]),
+            alcohol_condition_codes=frozenset(lifestyle["alcohol_condition_codes"]),
+            family_history_codes=frozenset(lifestyle["family_history_codes"]),
+            risky_jobs=frozenset(lifestyle["risky_jobs"]),
+            high_pollution_zips=frozenset(lifestyle["high_pollution_zips"]),
+            high_risk_med_terms=tuple(lifestyle["high_risk_med_terms"]),
+            er_encounter_code=lifestyle["er_encounter_code"],
+            er_window_days=lifestyle["er_window_days"],
+            vaccine_window_days=preventive["vaccine_window_days"],
+            vaccines=tuple(_compile_care_rule(r) for r in preventive["vaccines"]),
+            screenings=tuple(
+                _compile_care_rule(r, screening=True)
+                for r in preventive["screenings"]
+            ),
+            wellness_visit_code=preventive["wellness_visit_code"],
+            wellness_window_days=preventive["wellness_window_days"],
+            base_premium=premium["base_premium"],
+            premium_factors=tuple(
+                _compile_premium_factor(f) for f in premium["factors"]
+            ),
+        )
+
+
+def _compile_care_rule(raw: Mapping[str, Any], screening: bool = False) -> CareRule:
+    """Compile one vaccine or screening entry."""
+    if screening and (
+        raw.get("source") not in SCREENING_SOURCES or "window_days" not in raw
+    ):
+        raise ValueError(f"Screening needs a source and window_days: {raw!r}")
+    return CareRule(
+        codes=frozenset(raw["codes"]),
+        source=raw.get("source"),
+        window_days=raw.get("window_days"),
+        min_age=raw.get("min_age"),
+        below_age=raw.get("below_age"),
+        gender=raw.get("gender"),
+    )
+
+
+def _compile_premium_factor(raw: Mapping[str, Any]) -> PremiumFactor:
+    """Compile one premium factor entry."""
+    if raw["op"] not in OPERATORS:
+        raise ValueError(
+            f"Unknown operator {raw['op']!r} in premium factor {raw['name']!r}"
+        )
+    return PremiumFactor(
+        name=raw["name"],
+        fact=raw["fact"],
+        op=raw["op"],
+        value=raw["value"],
+        multiplier=float(raw["multiplier"]),
+        group=raw.get("group"),
+    )
+
+
+def load_rules(path: Optional[str] = None) -> RuleSet:
+    """
+    Load and compile a JSON rule file, once per path.
+
+    Args:
+        path (Optional[str]): Rule file path. Defaults to the bundled
+            ``insurance_rules.json``.
+
+    Returns:
+        RuleSet: The compiled rule set, shared by every caller.
+    """
+    return _load_rules(os.path.abspath(path or DEFAULT_RULES_PATH))
+
+
+@lru_cache(maxsize=None)
+def _load_rules(path: str) -> RuleSet:
+    with open(path, encoding="utf-8") as f:
+        return RuleSet.from_dict(json.load(f))
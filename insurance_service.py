@@ -0,0 +1,497 @@
+"""
+Insurance Quoting Service:
+A local asyncio HTTP service that quotes FHIR bundles.
+
+Endpoints:
+    POST /quote      Body: a FHIR Bundle. Returns patient id, eligibility,
+                     disqualifying reasons and premium as JSON.
+    GET  /metrics    Latency histograms and counters, Prometheus text format.
+    GET  /healthz    Liveness check.
+
+Requests are queued and micro-batched: the batcher collects up to
+``max_batch`` bundles, or whatever arrived within ``max_wait_ms``, and
+evaluates them in one process-pool task. The queue and the number of batches
+in flight are bounded; when the queue is full a request is rejected with
+503 instead of piling up (back-pressure). Every request carries a deadline
+(``X-Deadline-Ms`` header, or the service default) and gets 504 once it
+passes, whether it is still queued or already evaluating.
+
+Usage:
+    python insurance_service.py --port 8080 --workers 4
+
+Dependencies:
+    - asyncio (standard library only; no web framework)
+    - insurance_calculator_refactored
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from insurance_cache import QuoteCache, bundle_key
+from insurance_calculator_refactored import _evaluate_bundle
+from insurance_metrics import LatencyHistogram
+from insurance_rules import load_rules
+
+logger = logging.getLogger(__name__)
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class HttpError(Exception):
+    """An error answered with an HTTP status and a JSON error body."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _evaluate_many(
+    requests: List[Tuple[Dict, datetime]], rules_path: Optional[str]
+) -> List[Tuple[bool, object]]:
+    """
+    Evaluate a micro-batch of (bundle, as_of) pairs in a worker process.
+
+    A bundle that fails to evaluate does not fail its batch neighbours.
+
+    Returns:
+        List[Tuple[bool, object]]: Per bundle, (True, quote) or
+            (False, error message).
+    """
+    rules = load_rules(rules_path)
+    results = []
+    for bundle, as_of in requests:
+        try:
+            results.append((True, _evaluate_bundle(bundle, as_of=as_of, rules=rules)))
+        except Exception as e:
+            results.append((False, f"{type(e).__name__}: {e}"))
+    return results
+
+
+class QuotingService:
+    """
+    Micro-batching quoting service over a process pool.
+
+    Attributes:
+        request_latency (LatencyHistogram): End-to-end /quote latency.
+        batch_latency (LatencyHistogram): Process-pool time per micro-batch.
+        batch_sizes (LatencyHistogram): Bundles per micro-batch.
+        responses (Dict[int, int]): Responses sent per HTTP status.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue: int = 1024,
+        deadline_ms: float = 2000.0,
+        rules_path: Optional[str] = None,
+        cache: Optional[QuoteCache] = None,
+    ):
+        """
+        Initialize the service.
+
+        Args:
+            max_workers (Optional[int]): Worker processes. Defaults to every CPU.
+            max_batch (int): Maximum bundles per micro-batch.
+            max_wait_ms (float): Longest a queued bundle waits for batch mates.
+            max_queue (int): Queued requests accepted before answering 503.
+            deadline_ms (float): Default per-request deadline.
+            rules_path (Optional[str]): Rule file; defaults to the bundled one.
+            cache (Optional[QuoteCache]): Quote cache consulted before queueing.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.deadline = deadline_ms / 1000
+        self.rules_path = rules_path
+        self.rules = load_rules(rules_path)
+        self.cache = cache
+        self.request_latency = LatencyHistogram()
+        self.batch_latency = LatencyHistogram()
+        self.batch_sizes = LatencyHistogram(buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+        self.responses: Dict[int, int] = {}
+        self._queue: "asyncio.Queue" = asyncio.Queue(maxsize=max_queue)
+        # Batches in flight; two per worker keeps every worker busy
+        self._in_flight = asyncio.Semaphore(2 * self.max_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._batcher: Optional[asyncio.Task] = None
+        # Strong references to running batches; the loop only keeps weak ones
+        self._batches: Set[asyncio.Task] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        """Start the worker pool, the batcher and the HTTP listener."""
+        self._executor = self._new_executor()
+        self._batcher = asyncio.create_task(self._run_batcher())
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        sockets = ", ".join(str(s.getsockname()) for s in self._server.sockets)
+        logger.info(f"Quoting service listening on {sockets}")
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # Workers must not be forked from this process: they would inherit
+        # client sockets and keep connections open after we close them.
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context(
+            "forkserver" if "forkserver" in methods else "spawn"
+        )
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    async def close(self) -> None:
+        """Stop accepting connections and shut the worker pool down."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def port(self) -> int:
+        """Port the service is listening on."""
+        return self._server.sockets[0].getsockname()[1]
+
+    async def quote(self, bundle: Dict, deadline_ms: Optional[float] = None) -> Dict:
+        """
+        Quote one bundle through the cache, queue and process pool.
+
+        Args:
+            bundle (Dict): FHIR Bundle resource.
+            deadline_ms (Optional[float]): Deadline for this request.
+
+        Returns:
+            Dict: patient_id, eligible, reasons and premium.
+
+        Raises:
+            HttpError: 503 when the queue is full or the worker pool crashed,
+                504 past the deadline, 422 when the bundle cannot be evaluated
+                and 500 when its batch failed for another reason.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = self.deadline if deadline_ms is None else deadline_ms / 1000
+        deadline = loop.time() + timeout
+        as_of = datetime.now()
+        key = None
+        if self.cache is not None:
+            # Hashing the bundle and SQLite lookups block; keep them off the loop
+            key = await loop.run_in_executor(
+                None, bundle_key, bundle, self.rules, as_of
+            )
+            cached = await loop.run_in_executor(None, self.cache.get, key)
+            if cached is not None:
+                return _quote_json(cached)
+
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise HttpError(504, "Deadline exceeded")
+        future = loop.create_future()
+        try:
+            self._queue.put_nowait((bundle, as_of, deadline, future))
+        except asyncio.QueueFull:
+            raise HttpError(503, "Quote queue is full, retry later")
+        try:
+            ok, result = await asyncio.wait_for(future, remaining)
+        except asyncio.TimeoutError:
+            raise HttpError(504, "Deadline exceeded")
+        if not ok:
+            raise HttpError(422, result)
+        if self.cache is not None:
+            await loop.run_in_executor(None, self.cache.put, key, result)
+        return _quote_json(result)
+
+    async def _run_batcher(self) -> None:
+        """Drain the queue into micro-batches and hand them to the pool."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            flush_at = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = flush_at - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            now = loop.time()
+            # Requests whose caller gave up or whose deadline passed are dropped
+            batch = [item for item in batch if not item[3].done() and item[2] > now]
+            if not batch:
+                continue
+            await self._in_flight.acquire()
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[Tuple]) -> None:
+        """
+        Evaluate one micro-batch in the pool and resolve its futures.
+
+        Per-bundle evaluation errors come back as results. A failure of the
+        batch itself is a server fault: its futures get an HttpError, and a
+        broken pool (a worker died) is replaced so later batches can run.
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        executor = self._executor
+        error: Optional[Tuple[int, str]] = None
+        try:
+            results = await loop.run_in_executor(
+                executor,
+                _evaluate_many,
+                [(bundle, as_of) for bundle, as_of, _, _ in batch],
+                self.rules_path,
+            )
+        except BrokenProcessPool as e:
+            logger.error(f"Worker pool broke evaluating {len(batch)} bundles: {e}")
+            # Concurrent batches fail together; only the first replaces the pool
+            if self._executor is executor:
+                self._executor = self._new_executor()
+                executor.shutdown(wait=False, cancel_futures=True)
+            error = (503, "Worker pool restarted, retry later")
+        except Exception as e:
+            logger.exception(f"Batch of {len(batch)} failed: {e}")
+            error = (500, "Internal server error")
+        finally:
+            self._in_flight.release()
+        self.batch_latency.observe(time.perf_counter() - start)
+        self.batch_sizes.observe(len(batch))
+        for i, (_, _, _, future) in enumerate(batch):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(HttpError(*error))
+            else:
+                future.set_result(results[i])
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve HTTP/1.1 requests on one keep-alive connection."""
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self._dispatch(method, path, headers, body)
+                self.responses[status] = self.responses.get(status, 0) + 1
+                keep_alive = headers.get("connection", "").lower() != "close"
+                _write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HttpError as e:
+            _write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.exception(f"Unhandled error serving connection: {e}")
+            _write_response(
+                writer, 500, {"error": "Internal server error"}, keep_alive=False
+            )
+        finally:
+            writer.close()
+
+    async def _dispatch(
+        self, method: str, path: str, headers: Dict[str, str], body: bytes
+    ) -> Tuple[int, object]:
+        """Route one request; returns the status and a JSON or text payload."""
+        path = path.split("?", 1)[0]
+        if path == "/healthz":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            return 200, self.metrics_text()
+        if path != "/quote":
+            return 404, {"error": f"Unknown path {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+        start = time.perf_counter()
+        try:
+            try:
+                # Bodies run to MAX_BODY_BYTES; parse them off the loop
+                bundle = await asyncio.get_running_loop().run_in_executor(
+                    None, json.loads, body
+                )
+            except ValueError as e:
+                raise HttpError(400, f"Invalid JSON: {e}")
+            return 200, await self.quote(bundle, _deadline_header(headers))
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            logger.exception(f"Unhandled error quoting a bundle: {e}")
+            return 500, {"error": "Internal server error"}
+        finally:
+            self.request_latency.observe(time.perf_counter() - start)
+
+    def metrics_text(self) -> str:
+        """Service metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP quote_queue_depth Requests waiting for a micro-batch.",
+            "# TYPE quote_queue_depth gauge",
+            f"quote_queue_depth {self._queue.qsize()}",
+            "# HELP quote_responses_total Responses sent by HTTP status.",
+            "# TYPE quote_responses_total counter",
+        ]
+        for status, count in sorted(self.responses.items()):
+            lines.append(f'quote_responses_total{{status="{status}"}} {count}')
+        return (
+            "\n".join(lines)
+            + "\n"
+            + self.request_latency.to_prometheus(
+                "quote_request_latency_seconds", "End-to-end /quote latency."
+            )
+            + self.batch_latency.to_prometheus(
+                "quote_batch_latency_seconds", "Process-pool time per micro-batch."
+            )
+            + self.batch_sizes.to_prometheus(
+                "quote_batch_size", "Bundles per micro-batch."
+            )
+        )
+
+
+def _quote_json(quote: Tuple) -> Dict:
+    patient_id, eligible, reasons, premium = quote
+    return {
+        "patient_id": patient_id,
+        "eligible": eligible,
+        "reasons": list(reasons),
+        "premium": premium,
+    }
+
+
+def _deadline_header(headers: Dict[str, str]) -> Optional[float]:
+    """Parse the optional X-Deadline-Ms header."""
+    value = headers.get("x-deadline-ms")
+    if not value:
+        return None
+    try:
+        deadline_ms = float(value)
+    except ValueError:
+        raise HttpError(400, f"Invalid X-Deadline-Ms: {value!r}")
+    if not 0 < deadline_ms < float("inf"):
+        raise HttpError(400, f"X-Deadline-Ms must be positive, got {value!r}")
+    return deadline_ms
+
+
+async def _read_request(
+    reader: asyncio.StreamReader,
+) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """Read one HTTP/1.1 request; None when the client closed the connection."""
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length")
+    if length < 0:
+        raise HttpError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+
+def _write_response(
+    writer: asyncio.StreamWriter, status: int, payload: object, keep_alive: bool
+) -> None:
+    if isinstance(payload, str):
+        body = payload.encode("utf-8")
+        content_type = "text/plain; version=0.0.4"
+    else:
+        body = json.dumps(payload).encode("utf-8")
+        content_type = "application/json"
+    head = [
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    if status == 503:
+        head.append("Retry-After: 1")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+
+async def serve(host: str, port: int, **options) -> None:
+    """Run a ``QuotingService`` until cancelled."""
+    service = QuotingService(**options)
+    await service.start(host, port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-queue", type=int, default=1024)
+    parser.add_argument("--deadline-ms", type=float, default=2000.0)
+    parser.add_argument("--rules", default=None, help="rule file path")
+    parser.add_argument("--cache-size", type=int, default=0, help="0 disables the cache")
+    parser.add_argument("--cache-db", default=None, help="SQLite file for cached quotes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    cache = None
+    if args.cache_size or args.cache_db:
+        cache = QuoteCache(maxsize=args.cache_size or 10_000, path=args.cache_db)
+    try:
+        asyncio.run(
+            serve(
+                args.host,
+                args.port,
+                max_workers=args.workers,
+                max_batch=args.max_batch,
+                max_wait_ms=args.max_wait_ms,
+                max_queue=args.max_queue,
+                deadline_ms=args.deadline_ms,
+                rules_path=args.rules,
+                cache=cache,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
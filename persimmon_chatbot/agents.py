@@ -43,7 +43,12 @@ class InterviewAgent(Agent):
         super().__init__("InterviewAgent")
 
     def execute(self, state):
-        if 'audio_path' in state:  # Process answer
+        if 'transcript' in state:  # Answer already transcribed while streaming
+            state['answers'].append(state['transcript'])
+        elif 'audio' in state:  # Process answer from in-memory PCM samples
+            answer_text = utils.transcribe_audio(state['audio'])
+            state['answers'].append(answer_text)
+        elif 'audio_path' in state:  # Process answer
             answer_text = utils.transcribe_audio(state['audio_path'])
             state['answers'].append(answer_text)
         else:  # Generate question
@@ -67,18 +72,19 @@ class FeedbackAgent(Agent):
         return state
 
 class StateAgent(Agent):
-    def __init__(self):
+    def __init__(self, store=None):
         super().__init__("StateAgent")
+        self.store = store or utils.get_session_store()
 
     def execute(self, state):
         session_id = state['session_id']
         if 'resume_text' in state:
             # Store resume text
-            utils.store_state(session_id, {'resume_text': state['resume_text']})
+            utils.store_state(session_id, {'resume_text': state['resume_text']}, self.store)
             logging.info(f"Stored resume text for session_id: {session_id}, length: {len(state['resume_text'])}")
         else:
             # Retrieve resume text
-            stored_state = utils.retrieve_state(session_id)
+            stored_state = utils.retrieve_state(session_id, self.store)
             state['resume_text'] = stored_state.get('resume_text', '')
             logging.info(f"Retrieved resume text for session_id: {session_id}, length: {len(state['resume_text'])}")
         return state
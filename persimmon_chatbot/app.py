@@ -8,8 +8,6 @@ import os
 import logging
 from streamlit_webrtc import webrtc_streamer, WebRtcMode
 import av
-import queue
-import numpy as np
 from langgraph.graph import StateGraph
 
 # Setup logging
@@ -25,21 +23,24 @@ if 'stage' not in st.session_state:
     st.session_state.feedback = None
     st.session_state.session_id = str(uuid.uuid4())
     st.session_state.resume_buffer = None
-    st.session_state.audio_queue = queue.Queue()
+    st.session_state.transcriber = utils.StreamingTranscriber()
+# A finished transcriber ignores new frames, so every answer after one that
+# was finished or abandoned (including on an error path) records into a new one
+if st.session_state.transcriber.finished:
+    st.session_state.transcriber = utils.StreamingTranscriber()
 if 'graph' not in st.session_state:
     st.session_state.graph = graph.build_graph()
 
 st.title("Persimmon Chatbot - Job Portal")
 
-# Use graph and audio queue from session state
+# Use graph and streaming transcriber from session state
 workflow = st.session_state.graph
-audio_queue = st.session_state.audio_queue
+transcriber = st.session_state.transcriber
 
 def audio_frame_callback(frame: av.AudioFrame) -> av.AudioFrame:
     try:
-        audio_data = frame.to_ndarray()
-        logging.info(f"Received audio frame, shape: {audio_data.shape}")
-        audio_queue.put(audio_data)
+        # Transcription runs on the transcriber's own thread as frames arrive
+        transcriber.feed(utils.frame_to_pcm(frame))
     except Exception as e:
         logging.error(f"Audio frame callback error: {e}")
     return frame
@@ -201,39 +202,36 @@ if st.session_state.stage == 'interview':
     
     if webrtc_ctx.state.playing:
         st.write("Recording... Click 'Stop Recording' to finish.")
+        if transcriber.partial_text:
+            st.write(f"Live transcript: {transcriber.partial_text}")
     
     # Fallback audio upload
     audio_file = st.file_uploader("Or upload an audio file (if recording fails)", type=["wav", "mp3"], key=f"fallback_audio_{len(st.session_state.questions)}")
     
     if st.button("Stop Recording", key=f"stop_{len(st.session_state.questions)}") or audio_file:
         try:
-            if audio_file:
-                # Process uploaded audio file
-                audio_path = f"temp_answer_{st.session_state.session_id}_{len(st.session_state.questions)}.wav"
-                with open(audio_path, "wb") as f:
-                    f.write(audio_file.getbuffer())
-            else:
-                # Process WebRTC audio
-                audio_data = []
-                while not audio_queue.empty():
-                    audio_data.append(audio_queue.get())
-                if audio_data:
-                    audio_data = np.concatenate(audio_data, axis=0)
-                    audio_path = f"temp_answer_{st.session_state.session_id}_{len(st.session_state.questions)}.wav"
-                    utils.save_audio(audio_path, audio_data, sample_rate=16000)
-                else:
-                    st.error("No audio recorded via microphone. Please try again or upload an audio file.")
-                    logging.error(f"No audio data in queue for session_id: {st.session_state.session_id}")
-                    st.stop()
-            
-            # Process answer
             state = {
                 'session_id': st.session_state.session_id,
-                'audio_path': audio_path,
                 'question': st.session_state.current_question,
                 'answers': st.session_state.answers,
                 'action': 'process_answer'
             }
+            if audio_file:
+                # Process uploaded audio file, decoded in memory
+                transcriber.close()
+                state['audio'] = utils.decode_audio(audio_file.getvalue())
+            elif transcriber.samples_received:
+                # Process WebRTC audio: only the last window is still untranscribed
+                state['transcript'] = transcriber.finish()
+                if transcriber.samples_dropped:
+                    st.warning("Part of your answer could not be transcribed in time and was lost. "
+                               "Consider re-recording it.")
+            else:
+                st.error("No audio recorded via microphone. Please try again or upload an audio file.")
+                logging.error(f"No audio data received for session_id: {st.session_state.session_id}")
+                st.stop()
+
+            # Process answer
             result = run_workflow(state, 'process_answer')
             answer_text = result['answers'][-1]
             st.session_state.answers.append(answer_text)
@@ -294,16 +292,12 @@ if st.session_state.stage == 'interview':
                 st.session_state.feedback = result['feedback']
                 st.session_state.stage = 'feedback'
             
-            # Clean up
-            os.remove(audio_path)
-            # Clear audio queue
-            st.session_state.audio_queue = queue.Queue()
+            # Fresh transcriber for the next answer
+            st.session_state.transcriber = utils.StreamingTranscriber()
             st.rerun()
         except Exception as e:
             st.error(f"An error occurred while processing the audio: {str(e)}")
             logging.error(f"Audio processing error: {e}")
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
             st.stop()
 
 # Stage: Feedback
@@ -318,6 +312,8 @@ if st.session_state.stage == 'end':
     st.header("Process Completed")
     st.write("Thank you for using Persimmon Chatbot!")
     if st.button("Restart"):
+        transcriber.close()
+        utils.get_session_store().delete(st.session_state.session_id)
         for key in list(st.session_state.keys()):
             del st.session_state[key]
         st.rerun()
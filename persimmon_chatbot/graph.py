@@ -17,6 +17,8 @@ class InterviewState(TypedDict):
     answers: list
     current_question: str
     audio_path: str
+    audio: Any  # 16 kHz mono float32 samples
+    transcript: str
     feedback: str
     action: str  # For node selection in app.py
 